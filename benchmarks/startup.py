@@ -0,0 +1,54 @@
+"""Startup benchmark.
+
+Builds a Bridge against the huetui bridge simulator and reports how many
+requests the construction issued and how long it took. Run from the repo
+root:
+
+    python -m benchmarks.startup --lights 50 --latency 0.02
+"""
+from huetui.backend.bridge import Bridge
+from huetui.simulator import SimulatedBridge, Simulator
+from statistics import median
+import argparse
+import time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="huetui startup benchmark")
+    parser.add_argument("--lights", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    simulated = SimulatedBridge(
+        lights=args.lights,
+        groups=args.groups,
+        scenes=args.scenes,
+        latency=args.latency,
+    )
+    requests = []
+    timings = []
+
+    with Simulator(simulated) as simulator:
+        for _ in range(args.rounds):
+            simulated.reset_stats()
+
+            start = time.perf_counter()
+            bridge = Bridge(simulator.url)
+            timings.append(time.perf_counter() - start)
+            requests.append(simulated.stats["requests"])
+
+            bridge.close()
+
+    print(
+        f"Bridge() with {args.lights} lights, {args.groups} groups, "
+        f"{args.scenes} scenes at {args.latency * 1000:.0f} ms latency"
+    )
+    print(f"  requests:  {median(requests):.0f}")
+    print(f"  wall-clock: {median(timings) * 1000:.1f} ms (median of {args.rounds})")
+
+
+if __name__ == "__main__":
+    main()
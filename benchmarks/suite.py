@@ -0,0 +1,255 @@
+"""Backend benchmark suite.
+
+Runs the core backend operations against the huetui bridge simulator and
+reports requests, bytes transferred and p50/p95/p99 latency per operation.
+Results can be saved as JSON and compared against a previous run, failing
+if an operation needs more round-trips than before. Run from the repo root:
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --compare results.json
+"""
+from huetui.backend.bridge import Bridge
+from huetui.backend.client import Client
+from huetui.backend.light import RGB
+from huetui.backend.scheduler import CommandScheduler
+from huetui.simulator import SimulatedBridge, Simulator
+from PIL import Image
+from tempfile import TemporaryDirectory
+from os import path
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+
+def percentile(samples: list, q: float) -> float:
+    """nearest-rank percentile
+
+    Args:
+        samples (list): measured values
+        q (float): percentile between 0 and 100
+
+    Returns:
+        float: value at the percentile
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def connect(simulator: Simulator, paced: bool) -> Bridge:
+    """build a bridge, optionally without the client side rate limits
+
+    Args:
+        simulator (Simulator): simulator to connect to
+        paced (bool): keep the scheduler's default rate limits
+
+    Returns:
+        Bridge: connected bridge
+    """
+    client = Client()
+    if paced:
+        return Bridge(simulator.url, client)
+
+    scheduler = CommandScheduler(
+        client, light_rate=1000, group_rate=1000, light_burst=1000, group_burst=1000
+    )
+    return Bridge(simulator.url, client, scheduler=scheduler)
+
+
+def measure(simulated: SimulatedBridge, operation, iterations: int) -> dict:
+    """run an operation repeatedly and collect its cost
+
+    Args:
+        simulated (SimulatedBridge): simulated bridge the requests are counted on
+        operation (callable): called with the iteration number
+        iterations (int): number of runs
+
+    Returns:
+        dict: requests and bytes per run and latency percentiles in ms
+    """
+    timings = []
+    simulated.reset_stats()
+
+    for i in range(iterations):
+        start = time.perf_counter()
+        operation(i)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    stats = simulated.stats
+    return {
+        "iterations": iterations,
+        "requests": stats["requests"] / iterations,
+        "bytes_in": stats["bytes_in"] / iterations,
+        "bytes_out": stats["bytes_out"] / iterations,
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+    }
+
+
+def run(args) -> dict:
+    """run all benchmarks
+
+    Returns:
+        dict: results by operation
+    """
+    simulated = SimulatedBridge(
+        lights=args.lights,
+        groups=args.groups,
+        scenes=args.scenes,
+        latency=args.latency,
+        rate_limit=args.paced,
+    )
+    results = {}
+
+    with Simulator(simulated) as simulator, TemporaryDirectory() as tmp:
+        # bridge construction
+        bridges = []
+
+        def construct(i):
+            bridges.append(connect(simulator, args.paced))
+
+        results["bridge_init"] = measure(simulated, construct, args.iterations)
+        for bridge in bridges:
+            bridge.close()
+
+        bridge = connect(simulator, args.paced)
+        light = bridge.lights[0]
+        group = bridge.groups[0]
+        colors = [RGB(255, 0, 0), RGB(0, 0, 255)]
+
+        # one poll of the active devices menu and its redraw
+        def active_menu_refresh(i):
+            bridge.state.refresh("lights")
+            [f"({l.brightness}%) {l.name}" for l in bridge.lights if l.on]
+
+        results["active_menu_refresh"] = measure(
+            simulated, active_menu_refresh, args.iterations
+        )
+
+        def light_color(i):
+            light.color = colors[i % 2]
+
+        results["light_color_set"] = measure(simulated, light_color, args.iterations)
+
+        def group_toggle(i):
+            group.all_on = not group.all_on
+
+        results["group_all_on_toggle"] = measure(simulated, group_toggle, args.iterations)
+
+        def scene_set(i):
+            bridge.scenes[i % len(bridge.scenes)].set_to_group(group)
+
+        results["scene_set_to_group"] = measure(simulated, scene_set, args.iterations)
+
+        # two color stripes give a stable palette
+        image = path.join(tmp, "wallpaper.png")
+        wallpaper = Image.new("RGB", (64, 64), (200, 30, 30))
+        wallpaper.paste((30, 30, 200), (0, 32, 64, 64))
+        wallpaper.save(image)
+
+        def from_image(i):
+            bridge.set_lights_from_image(image)
+
+        results["set_lights_from_image"] = measure(
+            simulated, from_image, max(1, args.iterations // 10)
+        )
+
+        # the same state on every other light, not matching any group
+        selection = bridge.lights[::2]
+
+        def multi_light_set(i):
+            bridge.set_lights(selection, {"on": True, "bri": 100 + i % 2})
+
+        results["multi_light_set"] = measure(simulated, multi_light_set, args.iterations)
+
+        bridge.close()
+
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """find operations that need more round-trips than the baseline
+
+    Args:
+        results (dict): results of this run
+        baseline (dict): results of a previous run
+        tolerance (float): allowed relative increase
+
+    Returns:
+        list: descriptions of the regressions
+    """
+    regressions = []
+
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+
+        if result["requests"] > before["requests"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {before['requests']:.1f} -> {result['requests']:.1f} requests"
+            )
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="huetui backend benchmarks")
+    parser.add_argument("--lights", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--scenes", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per request")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument(
+        "--paced", action="store_true", help="keep the bridge's rate limits"
+    )
+    parser.add_argument("--output", help="save results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a previous run")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.0, help="allowed relative request increase"
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+
+    print(
+        f"{'operation':<24}{'requests':>10}{'bytes in':>10}{'bytes out':>11}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['requests']:>10.1f}{result['bytes_in']:>10.0f}"
+            f"{result['bytes_out']:>11.0f}{result['p50_ms']:>9.1f}"
+            f"{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "settings": vars(args),
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("regression: " + regression)
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
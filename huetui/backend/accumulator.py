@@ -0,0 +1,76 @@
+from typing import Callable
+import threading
+import time
+
+
+class Accumulator:
+    """Adds up rapid adjustments and applies them at most once per window.
+
+    The first adjustment of a key is applied right away. Adjustments made
+    while its window is still open are summed up and applied together
+    when it closes, so holding a key sends a handful of writes with the
+    latest target instead of one read-modify-write per key repeat.
+
+    Attributes:
+        _steps (dict): summed up steps not yet applied by key
+        _apply (dict): function applying the steps by key
+        _timers (dict): scheduled flushes by key
+        _applied (dict): monotonic time of the last flush by key
+        _lock (Lock): guards the dicts
+    """
+
+    def __init__(self) -> None:
+        self._steps = {}
+        self._apply = {}
+        self._timers = {}
+        self._applied = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self, key: str, step: float, apply: Callable[[float], None], window: float
+    ) -> None:
+        """add an adjustment
+
+        Args:
+            key (str): adjustments of the same key are summed up, e.g. a light's topic
+            step (float): amount to adjust by
+            apply (callable): called with the summed up steps once the window allows it
+            window (float): minimum seconds between two applies of the key
+        """
+        with self._lock:
+            self._steps[key] = self._steps.get(key, 0) + step
+            self._apply[key] = apply
+
+            if key in self._timers:
+                return
+
+            last = self._applied.get(key)
+            due = 0.0 if last is None else max(0.0, last + window - time.monotonic())
+
+            timer = threading.Timer(due, self._flush, (key,))
+            timer.daemon = True
+            self._timers[key] = timer
+
+        timer.start()
+
+    def _flush(self, key: str) -> None:
+        """apply the summed up steps of a key"""
+        with self._lock:
+            if key not in self._timers:
+                return
+
+            step = self._steps.pop(key)
+            apply = self._apply.pop(key)
+            del self._timers[key]
+            self._applied[key] = time.monotonic()
+
+        apply(step)
+
+    def flush(self) -> None:
+        """apply all waiting adjustments right away"""
+        with self._lock:
+            timers = list(self._timers.items())
+
+        for key, timer in timers:
+            timer.cancel()
+            self._flush(key)
@@ -0,0 +1,257 @@
+from huetui.backend.bridge import Bridge
+from huetui.backend.light import Light, RGB, Parameter
+from huetui.backend.group import Group
+from huetui.backend.scene import Scene
+from huetui.backend.utils import Util
+import asyncio
+import random
+
+
+class AsyncBridge(Util):
+    """asyncio counterpart of Bridge.
+
+    Shares the lights, groups, scenes and state store of a synchronous
+    Bridge. Requests go through the bridge's command scheduler and are
+    awaited without blocking the event loop, so fan-out operations run
+    concurrently instead of one light after another.
+
+    Args:
+        bridge (Bridge): bridge whose models and connections are shared
+        concurrency (int, optional): requests awaited at the same time. Defaults to 16.
+
+    Attributes:
+        _bridge (Bridge): bridge whose models and connections are shared
+        _semaphore (Semaphore): bounds the requests awaited at the same time
+    """
+
+    def __init__(self, bridge: Bridge, concurrency: int = 16) -> None:
+        self._bridge = bridge
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    async def connect(cls, url: str, concurrency: int = 16, **kwargs) -> "AsyncBridge":
+        """build a Bridge without blocking the event loop
+
+        Args:
+            url (str): url of the bridge
+            concurrency (int, optional): requests awaited at the same time. Defaults to 16.
+            **kwargs: passed on to Bridge
+
+        Returns:
+            AsyncBridge: bridge wrapping the new Bridge
+        """
+        bridge = await asyncio.to_thread(Bridge, url, **kwargs)
+        return cls(bridge, concurrency)
+
+    @property
+    def bridge(self) -> Bridge:
+        return self._bridge
+
+    @property
+    def lights(self) -> list:
+        return self._bridge.lights
+
+    @property
+    def groups(self) -> list:
+        return self._bridge.groups
+
+    @property
+    def scenes(self) -> list:
+        return self._bridge.scenes
+
+    async def api_get(self, address: str) -> dict:
+        """Make a get request through the bridge's command scheduler.
+
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            dict: response from api.
+        """
+        async with self._semaphore:
+            future = self._bridge.scheduler.submit("GET", address)
+            return await asyncio.wrap_future(future)
+
+    async def api_put(self, address: str, body: dict) -> bool:
+        """Make a put request through the bridge's command scheduler.
+
+        Args:
+            address (string): The address to make the request to.
+            body (dict): The values to put.
+
+        Returns:
+            bool: put successfull.
+        """
+        async with self._semaphore:
+            future = self._bridge.scheduler.submit("PUT", address, body)
+            return await asyncio.wrap_future(future)
+
+    async def refresh(self) -> None:
+        """refresh the state of all lights, groups and scenes with a single request"""
+        await asyncio.to_thread(self._bridge.refresh)
+
+    async def set_light(self, light: Light, state: dict) -> bool:
+        """set several parameters of a light with one request
+
+        Args:
+            light (Light): light to update
+            state (dict): v1 state values, e.g. {"on": True, "bri": 254}
+
+        Returns:
+            bool: update successfull
+        """
+        # skip what the light already has
+        state = self._bridge.filter_write([light], state)
+        if not state:
+            return True
+
+        addr = self._bridge.url + f"/lights/{light.lid}/state"
+
+        # show the change right away, the bridge confirms or rolls it back
+        try:
+            with self._bridge.optimistic([("lights", light.lid, "state", state)]):
+                await self.api_put(addr, state)
+        except Exception as e:
+            self._bridge.metrics.error(e)
+            return False
+
+        return True
+
+    async def set_lights(self, lights: list, state: dict) -> list:
+        """set the same parameters on many lights concurrently
+
+        Args:
+            lights (list): lights to update
+            state (dict): v1 state values
+
+        Returns:
+            list: update successfull per light
+        """
+        return await asyncio.gather(*(self.set_light(light, state) for light in lights))
+
+    async def set_on(self, light: Light, value: bool) -> bool:
+        """turn a light on or off
+
+        Args:
+            light (Light): light to update
+            value (bool): on state
+
+        Returns:
+            bool: update successfull
+        """
+        return await self.set_light(light, {Parameter.ON.value: value})
+
+    async def toggle(self, light: Light) -> bool:
+        """toggle a light on or off
+
+        Args:
+            light (Light): light to toggle
+
+        Returns:
+            bool: update successfull
+        """
+        # light.on may refetch the lights, which would block the event loop
+        return await self.set_on(light, not light.get_cached_param(Parameter.ON))
+
+    async def set_brightness(self, light: Light, value: int) -> bool:
+        """set a light's brightness
+
+        Args:
+            light (Light): light to update
+            value (int): brightness in percent
+
+        Returns:
+            bool: update successfull
+        """
+        if not 0 < value <= 100:
+            return False
+
+        return await self.set_light(
+            light, {Parameter.BRIGHTNESS.value: self.percent_to_value(value, 255)}
+        )
+
+    async def set_color(self, light: Light, rgb: RGB, on: bool = None) -> bool:
+        """set a light's color with one request
+
+        Args:
+            light (Light): light to update
+            rgb (RGB): color to set
+            on (bool, optional): also switch the light on or off. Defaults to None.
+
+        Returns:
+            bool: update successfull
+        """
+        return await self.set_light(light, self.color_state(rgb, on))
+
+    @staticmethod
+    def color_state(rgb: RGB, on: bool = None) -> dict:
+        """build the v1 state values of a color
+
+        Args:
+            rgb (RGB): color to convert
+            on (bool, optional): on state to include. Defaults to None.
+
+        Returns:
+            dict: v1 state values
+        """
+        hsv = Light.rgb_to_hsv(rgb.r, rgb.g, rgb.b)
+        state = {
+            Parameter.HUE.value: hsv.h,
+            Parameter.SATURATION.value: Util.percent_to_value(hsv.s, 255),
+            Parameter.BRIGHTNESS.value: Util.percent_to_value(hsv.v, 255),
+        }
+
+        if on is not None:
+            state[Parameter.ON.value] = on
+
+        return state
+
+    async def set_all_on(self, group: Group, value: bool) -> None:
+        """turn all lights of a group on or off with one request
+
+        Args:
+            group (Group): group to update
+            value (bool): on state
+        """
+        await asyncio.to_thread(group.set_action, {Parameter.ON.value: value})
+
+    async def set_group_color(self, group: Group, rgb: RGB) -> None:
+        """switch on all lights of a group and set their color with one request
+
+        Args:
+            group (Group): group to update
+            rgb (RGB): color to set
+        """
+        await asyncio.to_thread(group.set_color, rgb)
+
+    async def set_scene(self, group: Group, scene: Scene) -> bool:
+        """set a scene for a group
+
+        Args:
+            group (Group): group object
+            scene (Scene): scene object
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        addr = self._bridge.url + f"/groups/{group.gid}/action"
+        return await self.api_put(addr, {"scene": scene.sid})
+
+    async def set_lights_from_image(self, file) -> list:
+        """set the lights that are on to the colors of an image concurrently
+
+        Args:
+            file (str): path to image file
+
+        Returns:
+            list: update successfull per light
+        """
+        rgbs = await asyncio.to_thread(Bridge.palette_from_image, file)
+
+        return await asyncio.gather(
+            *(
+                self.set_color(light, random.choice(rgbs))
+                for light in self.lights
+                if light.get_cached_param(Parameter.ON)
+            )
+        )
@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class BridgeUnavailable(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a bridge that keeps failing.
+
+    After failure_threshold requests in a row failed (timeouts, connection
+    errors or 5xx responses) the breaker opens and requests fail right
+    away. Once recovery_time has passed a single trial request is let
+    through. If it succeeds the breaker closes again, otherwise it stays
+    open for another recovery_time.
+
+    Args:
+        failure_threshold (int, optional): failed requests in a row that open the breaker. Defaults to 5.
+        recovery_time (float, optional): seconds until a trial request is let through. Defaults to 5.0.
+
+    Attributes:
+        _failures (int): failed requests in a row
+        _opened (float): monotonic time the breaker opened at, None while closed
+        _trial (bool): whether a trial request is in flight
+        _lock (Lock): guards the state
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_time: float = 5.0) -> None:
+        self._failure_threshold = failure_threshold
+        self._recovery_time = recovery_time
+        self._failures = 0
+        self._opened = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        return self._opened is not None
+
+    def check(self) -> None:
+        """raise if a request may not be sent right now
+
+        Raises:
+            BridgeUnavailable: while the breaker is open
+        """
+        with self._lock:
+            if self._opened is None:
+                return
+
+            waited = time.monotonic() - self._opened
+            if waited >= self._recovery_time and not self._trial:
+                self._trial = True
+                return
+
+        raise BridgeUnavailable(
+            "bridge degraded, retrying in "
+            f"{max(0.0, self._recovery_time - waited):.0f}s"
+        )
+
+    def success(self) -> None:
+        """record a request the bridge answered"""
+        with self._lock:
+            self._failures = 0
+            self._opened = None
+            self._trial = False
+
+    def failure(self) -> bool:
+        """record a request that failed
+
+        Returns:
+            bool: True if the breaker opened because of it
+        """
+        with self._lock:
+            self._failures += 1
+
+            if self._trial:
+                # the trial failed, wait another recovery_time
+                self._trial = False
+                self._opened = time.monotonic()
+                return False
+
+            if self._opened is None and self._failures >= self._failure_threshold:
+                self._opened = time.monotonic()
+                return True
+
+        return False
@@ -1,14 +1,28 @@
 from dataclasses import dataclass
 from huetui.backend.utils import Util
-from huetui.backend.light import Light, RGB
+from huetui.backend.client import Client
+from huetui.backend.state import StateStore
+from huetui.backend.events import EventBus
+from huetui.backend.metrics import Metrics
+from huetui.backend.scheduler import CommandScheduler
+from huetui.backend.light import Light, Parameter, RGB
 from huetui.backend.scene import Scene
 from huetui.backend.group import Group
+from huetui.backend.registry import Registry
+from huetui.backend.transient import TransientGroups
+from huetui.backend.writefilter import WriteFilter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, ExitStack
 from os.path import expanduser
-from sys import exit as sysexit
-from traceback import print_exc
 from colorthief import ColorThief
 
+import json
 import random
+import time
+
+
+class BridgeConnectionError(Exception):
+    """Raised when a bridge could not be initialized from its api."""
 
 
 @dataclass
@@ -33,94 +47,348 @@ class Bridge(Util):
 
     Attributes:
         _url (str): url of the bridge
-        _lights (list): list of lights connected to the bridge
-        _scenes (list): list of scenes defined on bridge
-        _groups (list): list of groups defined on bridge
+        _client (class): keep-alive http client used for all bridge traffic
+        _state (class): cached bridge state that property reads are served from
+        _bus (class): delivers state changes to subscribers
+        _scheduler (class): rate-limited queue all writes are sent through
+        _write_filter (class): drops fields of writes that would change nothing
+        _transient (class): temporary groups for ad-hoc sets of lights
+        _registry (class): lights, scenes and groups indexed by id and name
         _info (class): bridge's metadata
     """
 
-    def __init__(self, url: str) -> None:
+    def __init__(
+        self,
+        url: str,
+        client: Client = None,
+        state_ttl: float = 1.0,
+        startup_timeout: float = 10.0,
+        scheduler: CommandScheduler = None,
+        write_filter: WriteFilter = None,
+    ) -> None:
         self._url = url
-        self._lights = []
-        self._scenes = []
-        self._groups = []
+        self._client = client if client is not None else Client()
+        self._write_filter = write_filter if write_filter is not None else WriteFilter()
+        self._client.metrics.describe(
+            "huetui_writes_saved", "writes not sent because nothing would change"
+        )
+        self._client.metrics.describe(
+            "huetui_fields_saved", "fields dropped from writes that would change nothing"
+        )
+        self._scheduler = (
+            scheduler if scheduler is not None else CommandScheduler(self._client)
+        )
+        self._bus = EventBus()
+        self._state = StateStore(self._fetch_resource, state_ttl, self._bus)
+        self._registry = Registry(self._entity_from_state)
+        self._transient = TransientGroups(self)
 
         self._info: Info = None
 
         # init bridge from api
         try:
-            self._init_lights_from_api()
-            self._init_scenes_from_api()
-            self._init_groups_from_api()
-            self._init_info_from_api()
-        except Exception:
-            print("Could not connect to bridge. Reason:")
-            print_exc(limit=1)
-            sysexit(1)
+            self._init_from_api(startup_timeout)
+        except Exception as e:
+            self._scheduler.close()
+            self._client.close()
+            # the url holds the api user, keep it out of the message
+            raise BridgeConnectionError(
+                f"Could not connect to bridge at {url.split('/api/')[0]}. "
+                f"Reason: {getattr(e, 'reason', None) or e!r}"
+            ) from e
+
+        # from now on follow what changes on the bridge
+        for resource in Registry.KINDS:
+            self._bus.subscribe(self._registry.on_change, resource)
+
+    def api_get(self, address: str) -> dict:
+        """Make a get request through the bridge's command scheduler.
 
-    def _init_lights_from_api(self) -> None:
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            dict: response from api.
         """
-        initialize all lights by querying the api
+        return self._scheduler.submit("GET", address).result()
+
+    def api_put(self, address: str, data: str) -> bool:
+        """Make a put request through the bridge's command scheduler.
+
+        The request is paced by the bridge's rate limits and merged with
+        other queued writes to the same address. Blocks until it was sent.
+
+        Args:
+            address (string): The address to make the request to.
+            data (string): The data to put.
+
+        Returns:
+            bool: put successfull.
         """
-        addr = self._url + f"/lights"
-        lights = self.api_get(addr)
+        return self._scheduler.submit("PUT", address, json.loads(data)).result()
 
-        for lid in lights:
-            self._lights.append(Light(self, int(lid)))
+    def api_post(self, address: str, body: dict) -> list:
+        """Make a post request through the bridge's command scheduler.
+
+        Args:
+            address (string): The address to make the request to.
+            body (dict): The values to post.
 
-    def _init_scenes_from_api(self) -> None:
+        Returns:
+            list: response from api.
         """
-        initialize all scenes by querying the api
+        return self._scheduler.submit("POST", address, body).result()
+
+    def api_delete(self, address: str) -> bool:
+        """Make a delete request through the bridge's command scheduler.
+
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            bool: delete successfull.
         """
-        addr = self._url + f"/scenes"
-        scenes = self.api_get(addr)
+        return self._scheduler.submit("DELETE", address).result()
 
-        # for each scene
-        for sid in scenes:
-            name = scenes[sid]["name"]
-            lights = []
+    def filter_write(self, lights: list, changes: dict) -> dict:
+        """drop the fields of a write the lights already have
+
+        Args:
+            lights (list): lights the write applies to
+            changes (dict): v1 state values to write
+
+        Returns:
+            dict: the fields that need to be sent, empty if none
+        """
+        documents = []
+        for light in lights:
+            entity = self._state.peek("lights", light.lid)
+            documents.append(entity.get("state") if entity is not None else None)
+
+        trimmed = self._write_filter.trim(documents, changes)
+
+        # an empty write was never going to be sent
+        if changes and not trimmed:
+            self.metrics.inc("huetui_writes_saved")
+        if len(trimmed) < len(changes):
+            self.metrics.inc("huetui_fields_saved", len(changes) - len(trimmed))
+
+        return trimmed
+
+    @contextmanager
+    def optimistic(self, patches: list):
+        """Show a write in the state store while it is being sent
+
+        The patches are applied when the block is entered, confirmed if it
+        exits normally and rolled back if it raises. Fields only describing
+        how a change is made, like transitiontime, are not stored.
+
+        Args:
+            patches (list): (resource, eid, key, changes) tuples, e.g.
+                ("lights", 3, "state", {"on": True})
+
+        Example:
+            with bridge.optimistic([("lights", 3, "state", changes)]):
+                bridge.api_put(address, json.dumps(changes))
+        """
+        patches = [
+            (
+                resource,
+                eid,
+                key,
+                {
+                    param: value
+                    for param, value in changes.items()
+                    if param not in WriteFilter.MODIFIERS
+                },
+            )
+            for resource, eid, key, changes in patches
+        ]
+        applied = [(patch, self._state.apply(*patch)) for patch in patches]
+
+        try:
+            yield
+        except BaseException:
+            for patch, previous in applied:
+                self._state.revert(*patch, previous)
+            raise
 
-            # find lights from scene in bridge
-            for lid in scenes[sid]["lights"]:
-                light = self.light_by_id(int(lid))
+        for patch, _ in applied:
+            self._state.confirm(*patch)
 
-                # check if light is found
-                if light:
-                    lights.append(light)
+    def subscribe(self, callback, topic: str = EventBus.BRIDGE) -> None:
+        """Register a callback for state changes
+
+        Topics are "bridge" for all changes, "lights" or "groups" for a whole
+        collection and e.g. light.topic for a single light or group.
+
+        Args:
+            callback (callable): called with a list of StateEvents
+            topic (str, optional): topic to subscribe to. Defaults to "bridge".
+        """
+        self._bus.subscribe(callback, topic)
 
-            # create scene object and append
-            self._scenes.append(Scene(self, sid, name, lights))
+    def unsubscribe(self, callback, topic: str = EventBus.BRIDGE) -> None:
+        """Remove a callback registered with subscribe
 
-    def _init_groups_from_api(self) -> None:
+        Args:
+            callback (callable): callback to remove
+            topic (str, optional): topic it was subscribed to. Defaults to "bridge".
         """
-        initialize all groups by querying the api
+        self._bus.unsubscribe(callback, topic)
+
+    def background(self):
+        """Context in which this thread's requests yield to interactive ones
+
+        Example:
+            with bridge.background():
+                poll(bridge)
         """
-        addr = self._url + f"/groups"
-        groups = self.api_get(addr)
+        return self._scheduler.background()
 
-        # for each scene
-        for gid in groups:
-            name = groups[gid]["name"]
-            lights = []
+    def close(self) -> None:
+        """delete the transient groups, send all queued writes and close the bridge's connections"""
+        self._transient.clear()
+        self._scheduler.close()
+        self._client.close()
+
+    def _fetch_resource(self, resource: str) -> dict:
+        """fetch a collection (or the whole datastore) for the state store
 
-            # find lights from scene in bridge
-            for lid in groups[gid]["lights"]:
-                light = self.light_by_id(int(lid))
+        Args:
+            resource (str): name of the collection, "" for the whole datastore
+
+        Returns:
+            dict: response from api
+        """
+        addr = self._url + (f"/{resource}" if resource else "")
+        return self.api_get(addr)
+
+    def refresh(self) -> None:
+        """refresh the state of all lights, groups and scenes with a single request"""
+        self._state.snapshot()
+
+    def _init_from_api(self, timeout: float) -> None:
+        """fetch lights, scenes, groups and metadata concurrently and
+        initialize each of them as soon as its payload arrives
+
+        Args:
+            timeout (float): overall time budget for the startup in seconds
+        """
+        deadline = time.monotonic() + timeout
+        pool = ThreadPoolExecutor(max_workers=4)
+
+        try:
+            lights = pool.submit(self._fetch_resource, "lights")
+            fetches = {
+                pool.submit(self._fetch_resource, "scenes"): self._init_scenes_from_api,
+                pool.submit(self._fetch_resource, "groups"): self._init_groups_from_api,
+                pool.submit(self._fetch_resource, "config"): self._init_info_from_api,
+            }
+
+            # scenes and groups resolve against the lights, so those come first
+            self._init_lights_from_api(
+                lights.result(max(0, deadline - time.monotonic()))
+            )
+
+            for fetch in as_completed(fetches, max(0, deadline - time.monotonic())):
+                fetches[fetch](fetch.result())
+
+        finally:
+            # don't wait for requests that exceeded the budget
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _init_lights_from_api(self, lights: dict) -> None:
+        """
+        initialize all lights from the /lights payload
+        """
+        # seed the state store so the lights need no requests of their own
+        self._state.load("lights", lights)
+
+        for lid in lights:
+            self._registry.add("lights", Light(self, int(lid), lights[lid]))
+
+    def _lights_of(self, lids: list) -> list:
+        """find the lights of a group or scene payload, skipping unknown ids"""
+        lights = []
+
+        for lid in lids:
+            light = self.light_by_id(int(lid))
+
+            # check if light is found
+            if light:
+                lights.append(light)
+
+        return lights
+
+    def _init_scenes_from_api(self, scenes: dict) -> None:
+        """
+        initialize all scenes from the /scenes payload
+        """
+        # seed the state store so later refreshes are diffed against it
+        self._state.load("scenes", scenes)
 
-                # check if light is found
-                if light:
-                    lights.append(light)
+        # create scene objects and register them
+        for sid in scenes:
+            self._registry.add("scenes", self._scene_from_api(sid, scenes[sid]))
 
-            # create scene object and append
-            self._groups.append(Group(self, int(gid), name, lights))
+    def _scene_from_api(self, sid: str, scene: dict) -> Scene:
+        """build a scene from its payload"""
+        return Scene(self, sid, scene["name"], self._lights_of(scene["lights"]))
 
-    def _init_info_from_api(self) -> None:
+    def _init_groups_from_api(self, groups: dict) -> None:
+        """
+        initialize all groups from the /groups payload
         """
-        initialize the bridge's metadata by querying the api
+        # seed the state store so the groups need no requests of their own
+        self._state.load("groups", groups)
+
+        # delete transient groups left over by a previous session
+        if any(
+            group["name"].startswith(TransientGroups.PREFIX) for group in groups.values()
+        ):
+            self._transient.sweep(groups)
+
+        # create group objects and register them
+        for gid in groups:
+            group = self._group_from_api(int(gid), groups[gid])
+            if group is not None:
+                self._registry.add("groups", group)
+
+    def _group_from_api(self, gid: int, group: dict) -> Group:
+        """build a group from its payload, None for transient groups"""
+        name = group["name"]
+
+        # skip transient groups, they are not the user's
+        if name.startswith(TransientGroups.PREFIX):
+            return None
+
+        return Group(self, gid, name, self._lights_of(group["lights"]), group)
+
+    def _entity_from_state(self, kind: str, eid):
+        """build a light, group or scene that was added on the bridge
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            eid (int, str): id of the entity
+
+        Returns:
+            Light, Group, Scene: the new entity or None to skip it
         """
-        addr = self._url + f"/config"
-        info = self.api_get(addr)
+        document = self._state.peek(kind, eid)
+        if document is None:
+            return None
 
+        if kind == "lights":
+            return Light(self, eid, document)
+        if kind == "groups":
+            return self._group_from_api(eid, document)
+        return self._scene_from_api(eid, document)
+
+    def _init_info_from_api(self, info: dict) -> None:
+        """
+        initialize the bridge's metadata from the /config payload
+        """
         self._info = Info(
             name=info["name"],
             id=info["bridgeid"],
@@ -139,10 +407,7 @@ class Bridge(Util):
         Returns:
             Light: light object with passed id
         """
-        for light in self._lights:
-            if light.lid == lid:
-                return light
-        return None
+        return self._registry.by_id("lights", lid)
 
     def light_by_name(self, name: str) -> Light:
         """find light by name
@@ -153,10 +418,7 @@ class Bridge(Util):
         Returns:
             Light: light object with passed name
         """
-        for light in self._lights:
-            if light.name == name:
-                return light
-        return None
+        return self._registry.by_name("lights", name)
 
     def scene_by_id(self, sid: str) -> Scene:
         """find scene by id
@@ -167,10 +429,7 @@ class Bridge(Util):
         Returns:
             Scene: scene object with passed id
         """
-        for scene in self._scenes:
-            if scene.sid == sid:
-                return scene
-        return None
+        return self._registry.by_id("scenes", sid)
 
     def scene_by_name(self, name: str) -> Scene:
         """find scene by name
@@ -181,10 +440,7 @@ class Bridge(Util):
         Returns:
             Scene: scene object with passed name
         """
-        for scene in self._scenes:
-            if scene.name == name:
-                return scene
-        return None
+        return self._registry.by_name("scenes", name)
 
     def group_by_id(self, gid: int) -> Group:
         """find group by id
@@ -195,10 +451,7 @@ class Bridge(Util):
         Returns:
             Group: group object with passed id
         """
-        for group in self._groups:
-            if group.gid == gid:
-                return group
-        return None
+        return self._registry.by_id("groups", gid)
 
     def group_by_name(self, name: str) -> Group:
         """find group by name
@@ -209,24 +462,29 @@ class Bridge(Util):
         Returns:
             Group: group object with passed name
         """
-        for group in self._groups:
-            if group.name == name:
-                return group
-        return None
+        return self._registry.by_name("groups", name)
 
-    def scene_by_name(self, name: str) -> Scene:
-        """find scene by name
+    def groups_of(self, light: Light) -> list:
+        """find the groups a light is a member of
 
         Args:
-            name (str): name of the scene
+            light (Light): light object
 
         Returns:
-            Scene: scene object with passed name
+            list: group objects containing the light
+        """
+        return self._registry.groups_of(light.lid)
+
+    def scenes_of(self, light: Light) -> list:
+        """find the scenes a light is part of
+
+        Args:
+            light (Light): light object
+
+        Returns:
+            list: scene objects containing the light
         """
-        for scene in self._scenes:
-            if scene.name == name:
-                return scene
-        return None
+        return self._registry.scenes_of(light.lid)
 
     def set_scene(self, group: Group, scene: Scene) -> bool:
         """set a scene for a group
@@ -240,21 +498,117 @@ class Bridge(Util):
         """
         return scene.set_to_group(group)
 
+    @contextmanager
+    def transaction(self):
+        """Merge all light changes made inside the block into one request per light
+
+        Example:
+            with bridge.transaction():
+                for light in bridge.lights:
+                    light.on = True
+                    light.color = RGB(255, 0, 0)
+        """
+        with ExitStack() as stack:
+            for light in self.lights:
+                stack.enter_context(light.batch())
+
+            yield self
+
+    def set_lights(self, lights: list, changes: dict, transitiontime: int = None) -> None:
+        """set the same state on several lights with as few requests as possible
+
+        Group actions are paced at about one per second, so sets that fit
+        into the scheduler's light burst get one light write per light. Larger
+        sets matching one of the bridge's groups get its group action and any
+        other set a transient group.
+
+        Args:
+            lights (list): lights to update
+            changes (dict): v1 state values, e.g. {"on": True, "bri": 254}
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        if not lights:
+            return
+
+        if len(lights) <= self._scheduler.burst("lights"):
+            self.set_lights_individually(lights, changes, transitiontime)
+            return
+
+        lids = {light.lid for light in lights}
+        for group in self.groups_of(lights[0]):
+            if {light.lid for light in group.lights} == lids:
+                group.set_action(changes, transitiontime)
+                return
+
+        self._transient.set_lights(lights, changes, transitiontime)
+
+    def set_lights_individually(
+        self, lights: list, changes: dict, transitiontime: int = None
+    ) -> None:
+        """set the same state on several lights with one request per light
+
+        Args:
+            lights (list): lights to update
+            changes (dict): v1 state values, e.g. {"on": True, "bri": 254}
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        if transitiontime is not None:
+            changes = {**changes, Parameter.TRANSITION_TIME.value: transitiontime}
+
+        for light in lights:
+            # skip what the light already has
+            state = self.filter_write([light], changes)
+            if not state:
+                continue
+
+            addr = self._url + f"/lights/{light.lid}/state"
+
+            # show the change right away, the bridge confirms or rolls it back
+            try:
+                with self.optimistic([("lights", light.lid, "state", state)]):
+                    self.api_put(addr, json.dumps(state))
+            except Exception as e:
+                self.metrics.error(e)
+
     @property
     def url(self) -> str:
         return self._url
 
+    @property
+    def client(self) -> Client:
+        return self._client
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._client.metrics
+
+    @property
+    def transient(self) -> TransientGroups:
+        return self._transient
+
+    @property
+    def scheduler(self) -> CommandScheduler:
+        return self._scheduler
+
+    @property
+    def state(self) -> StateStore:
+        return self._state
+
     @property
     def lights(self) -> list:
-        return self._lights
+        return self._registry.all("lights")
 
     @property
     def scenes(self) -> list:
-        return self._scenes
+        return self._registry.all("scenes")
 
     @property
     def groups(self) -> list:
-        return self._groups
+        return self._registry.all("groups")
+
+    @property
+    def registry(self) -> Registry:
+        return self._registry
 
     @property
     def info(self) -> Info:
@@ -268,15 +622,34 @@ class Bridge(Util):
         """
         return f"Name:\t {self._info.name}\nID:\t {self._info.id}\nIP:\t {self._info.ip}\nMAC:\t {self._info.mac}\nSW:\t v{self._info.sw_version}\nAPI:\t v{self._info.api_version}"
 
+    @staticmethod
+    def palette_from_image(file) -> list:
+        """extract the dominant colors of an image
+
+        Args:
+            file (str): path to image file
+
+        Returns:
+            list: palette as RGB tuples
+        """
+        colors = ColorThief(expanduser(file)).get_palette(color_count=5, quality=50)
+        return [RGB(*c) for c in colors]
+
     def set_lights_from_image(self, file) -> None:
         """set lights from image
 
         Args:
             file (str): path to image file
         """
-        colors = ColorThief(expanduser(file)).get_palette(color_count=5, quality=50)
-        rgbs = [RGB(*c) for c in colors]
+        self.set_lights_to_palette(self.palette_from_image(file))
+
+    def set_lights_to_palette(self, rgbs: list) -> None:
+        """set every light that is on to a random color of a palette
 
-        for light in self.lights:
-            if light.on:
-                light.color = random.choice(rgbs)
+        Args:
+            rgbs (list): palette as RGB tuples
+        """
+        with self.transaction():
+            for light in self.lights:
+                if light.on:
+                    light.color = random.choice(rgbs)
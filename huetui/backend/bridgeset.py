@@ -0,0 +1,262 @@
+from huetui.backend.bridge import Bridge
+from huetui.backend.events import EventBus
+from huetui.backend.metrics import Metrics
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class BridgeSet:
+    """Several bridges behind the interface of one.
+
+    Lights, groups and scenes of all bridges are merged into one list each,
+    in the order of the bridges. With more than one bridge their names are
+    prefixed by the name of the bridge they belong to. Changes that span
+    several bridges are sent to all of them in parallel, each bridge pacing
+    its own writes. The lists follow lights, groups and scenes added or
+    removed on the bridges.
+
+    Args:
+        bridges (list): initialized bridges
+        names (list, optional): name of every bridge, None to use the name
+            the bridge reports. Defaults to the reported names.
+
+    Attributes:
+        _bridges (list): initialized bridges
+        _names (list): name of every bridge
+        _owners (dict): bridge of every light, group and scene, rebuilt when
+            an entity is missing
+        _pool (ThreadPoolExecutor): sends changes to the bridges in parallel
+    """
+
+    def __init__(self, bridges: list, names: list = None) -> None:
+        names = names if names is not None else [None] * len(bridges)
+
+        self._bridges = bridges
+        self._names = [
+            name if name is not None else bridge.info.name
+            for bridge, name in zip(bridges, names)
+        ]
+        self._owners = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(bridges)))
+
+    @classmethod
+    def connect(
+        cls, factories: list, names: list = None, metrics: Metrics = None
+    ) -> "BridgeSet":
+        """initialize bridges concurrently
+
+        A bridge that can't be reached is skipped with a warning, so one
+        unreachable bridge doesn't keep the others from being used.
+
+        Args:
+            factories (list): callables creating one bridge each, called with
+                the metrics registry shared by all bridges
+            names (list, optional): name of every bridge. Defaults to the reported names.
+            metrics (Metrics, optional): shared registry. Defaults to a new one.
+
+        Returns:
+            BridgeSet: the bridges that could be initialized
+
+        Raises:
+            BridgeConnectionError: the error of the first bridge if none could be initialized
+        """
+        metrics = metrics if metrics is not None else Metrics()
+        names = names if names is not None else [None] * len(factories)
+
+        def build(factory):
+            try:
+                return factory(metrics), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, len(factories))) as pool:
+            results = list(pool.map(build, factories))
+
+        connected = [
+            (bridge, name)
+            for (bridge, _), name in zip(results, names)
+            if bridge is not None
+        ]
+        if not connected:
+            raise results[0][1]
+
+        for index, ((_, error), name) in enumerate(zip(results, names)):
+            if error is not None:
+                label = name if name is not None else f"#{index + 1}"
+                print(f"Skipping bridge {label}. {error}")
+
+        return cls([bridge for bridge, _ in connected], [name for _, name in connected])
+
+    def _fan_out(self, func: Callable[[Bridge], None], bridges: list = None) -> None:
+        """call func with every bridge in parallel and wait for all of them
+
+        Raises:
+            Exception: the first error raised by func, after all calls finished
+        """
+        bridges = bridges if bridges is not None else self._bridges
+        if len(bridges) == 1:
+            func(bridges[0])
+            return
+
+        futures = [self._pool.submit(func, bridge) for bridge in bridges]
+        errors = [future.exception() for future in futures]
+
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def bridge_of(self, entity) -> Bridge:
+        """find the bridge a light, group or scene belongs to
+
+        Args:
+            entity (Light, Group, Scene): light, group or scene
+
+        Returns:
+            Bridge: bridge object or None if no bridge has it (anymore)
+        """
+        if entity is not None and entity not in self._owners:
+            self._owners = {
+                member: bridge
+                for bridge in self._bridges
+                for member in bridge.lights + bridge.groups + bridge.scenes
+            }
+
+        return self._owners.get(entity)
+
+    def name_of(self, entity) -> str:
+        """name of a light, group or scene prefixed by its bridge's name
+
+        Args:
+            entity (Light, Group, Scene): light, group or scene
+
+        Returns:
+            str: the plain name if there is only one bridge
+        """
+        if len(self._bridges) == 1:
+            return entity.name
+
+        bridge = self.bridge_of(entity)
+        if bridge is None:
+            return entity.name
+
+        return f"{self._names[self._bridges.index(bridge)]}/{entity.name}"
+
+    def topic_of(self, entity) -> str:
+        """topic of a light or group that is unique across bridges
+
+        Args:
+            entity (Light, Group): light or group
+
+        Returns:
+            str: e.g. "1/lights/3", None if no bridge has it (anymore)
+        """
+        bridge = self.bridge_of(entity)
+        if bridge is None:
+            return None
+
+        return f"{self._bridges.index(bridge)}/{entity.topic}"
+
+    def subscribe(self, callback, topic: str = EventBus.BRIDGE) -> None:
+        """Register a callback for state changes of every bridge
+
+        Args:
+            callback (callable): called with the list of changed entities' events
+            topic (str, optional): topic to subscribe to. Defaults to "bridge".
+        """
+        for bridge in self._bridges:
+            bridge.subscribe(callback, topic)
+
+    def unsubscribe(self, callback, topic: str = EventBus.BRIDGE) -> None:
+        """Remove a callback registered with subscribe
+
+        Args:
+            callback (callable): the registered callback
+            topic (str, optional): topic it was subscribed to. Defaults to "bridge".
+        """
+        for bridge in self._bridges:
+            bridge.unsubscribe(callback, topic)
+
+    def refresh(self) -> None:
+        """refresh the state of all bridges in parallel"""
+        self._fan_out(Bridge.refresh)
+
+    def close(self) -> None:
+        """close all bridges in parallel"""
+        try:
+            self._fan_out(Bridge.close)
+        finally:
+            self._pool.shutdown()
+
+    def set_lights(self, lights: list, changes: dict, transitiontime: int = None) -> None:
+        """set the same state on lights of several bridges
+
+        Every bridge gets its share of the lights in parallel, see Bridge.set_lights.
+
+        Args:
+            lights (list): lights to update
+            changes (dict): v1 state values, e.g. {"on": True, "bri": 254}
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridges' 400ms.
+        """
+        shares = {}
+        for light in lights:
+            bridge = self.bridge_of(light)
+            # skip lights removed from their bridge meanwhile
+            if bridge is not None:
+                shares.setdefault(bridge, []).append(light)
+
+        self._fan_out(
+            lambda bridge: bridge.set_lights(shares[bridge], changes, transitiontime),
+            list(shares),
+        )
+
+    def set_lights_from_image(self, file) -> None:
+        """set the lights of all bridges from image
+
+        Args:
+            file (str): path to image file
+        """
+        rgbs = Bridge.palette_from_image(file)
+        self._fan_out(lambda bridge: bridge.set_lights_to_palette(rgbs))
+
+    def info_as_str(self) -> str:
+        """return the bridges' metadata as string
+
+        Returns:
+            str: metadata of the bridge, or name and ip of every bridge
+        """
+        if len(self._bridges) == 1:
+            return self._bridges[0].info_as_str()
+
+        return "\n".join(
+            f"{name}:\t {bridge.info.ip} ({len(bridge.lights)} lights)"
+            for name, bridge in zip(self._names, self._bridges)
+        )
+
+    @property
+    def bridges(self) -> list:
+        return self._bridges
+
+    @property
+    def names(self) -> list:
+        return self._names
+
+    @property
+    def metrics(self) -> Metrics:
+        # connect() makes all bridges record into one registry
+        return self._bridges[0].metrics
+
+    @property
+    def degraded(self) -> bool:
+        return any(bridge.client.breaker.open for bridge in self._bridges)
+
+    @property
+    def lights(self) -> list:
+        return [light for bridge in self._bridges for light in bridge.lights]
+
+    @property
+    def groups(self) -> list:
+        return [group for bridge in self._bridges for group in bridge.groups]
+
+    @property
+    def scenes(self) -> list:
+        return [scene for bridge in self._bridges for scene in bridge.scenes]
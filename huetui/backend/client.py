@@ -0,0 +1,439 @@
+from click import MissingParameter
+from concurrent.futures import Future
+from huetui.backend.breaker import CircuitBreaker
+from huetui.backend.metrics import Metrics, endpoint_of
+import urllib3
+import copy
+import json
+import random
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Raised when the bridge answered 503 because it got too many commands."""
+
+
+class Client:
+    """Class representing a keep-alive http connection pool to a bridge.
+
+    Args:
+        pool_size (int, optional): connections kept open per host. Defaults to 4.
+        connect_timeout (float, optional): connect timeout in seconds. Defaults to 2.0.
+        read_timeout (float, optional): read timeout in seconds. Defaults to 5.0.
+        deadline (float, optional): seconds a request may take including retries. Defaults to 8.0.
+        retries (int, optional): retries of failed idempotent requests. Defaults to 2.
+        backoff (float, optional): seconds before the first retry, doubled for every further one. Defaults to 0.1.
+        max_backoff (float, optional): maximum seconds between two retries. Defaults to 1.0.
+        failure_threshold (int, optional): failed requests in a row that mark the bridge as degraded. Defaults to 5.
+        recovery_time (float, optional): seconds requests fail fast once the bridge is degraded. Defaults to 5.0.
+        metrics (Metrics, optional): registry the traffic is recorded in. Defaults to a new one.
+
+    Attributes:
+        _pool_size (int): connections kept open per host
+        _timeout (Timeout): connect and read timeouts of each request
+        _deadline (float): seconds a request may take including retries
+        _retries (int): retries of failed idempotent requests
+        _backoff (float): seconds before the first retry
+        _max_backoff (float): maximum seconds between two retries
+        _breaker (CircuitBreaker): fails requests fast while the bridge keeps failing
+        _headers (dict): headers sent with every request
+        _http (PoolManager): connection pool shared by all requests
+        _metrics (Metrics): registry the traffic is recorded in
+        _flights (dict): gets in flight by address
+        _flights_lock (Lock): guards the gets in flight
+    """
+
+    # methods that can be sent again without changing their outcome
+    IDEMPOTENT = ("GET", "PUT", "DELETE")
+
+    def __init__(
+        self,
+        pool_size: int = 4,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 5.0,
+        deadline: float = 8.0,
+        retries: int = 2,
+        backoff: float = 0.1,
+        max_backoff: float = 1.0,
+        failure_threshold: int = 5,
+        recovery_time: float = 5.0,
+        metrics: Metrics = None,
+    ) -> None:
+        self._pool_size = pool_size
+        self._timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        self._deadline = deadline
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._breaker = CircuitBreaker(failure_threshold, recovery_time)
+        self._headers = {"Connection": "keep-alive"}
+        self._http = urllib3.PoolManager(
+            maxsize=pool_size,
+            timeout=self._timeout,
+            headers=self._headers,
+            retries=False,
+        )
+
+        self._metrics = metrics if metrics is not None else Metrics()
+        self._metrics.describe("huetui_requests", "requests sent to the bridge")
+        self._metrics.describe(
+            "huetui_request_duration_seconds", "latency of requests to the bridge"
+        )
+        self._metrics.describe("huetui_request_errors", "failed requests")
+        self._metrics.describe("huetui_request_timeouts", "requests that timed out")
+        self._metrics.describe("huetui_bytes_sent", "request body bytes")
+        self._metrics.describe("huetui_bytes_received", "response body bytes")
+        self._metrics.describe(
+            "huetui_shared_gets", "gets sent or joined to an identical get in flight"
+        )
+        self._metrics.describe("huetui_request_retries", "requests sent again")
+        self._metrics.describe(
+            "huetui_breaker_opened", "times the bridge was marked as degraded"
+        )
+
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    @property
+    def pool_size(self) -> int:
+        return self._pool_size
+
+    @property
+    def metrics(self) -> Metrics:
+        return self._metrics
+
+    @property
+    def retries(self) -> int:
+        return self._retries
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    def _request(self, method: str, address: str, **kwargs) -> urllib3.HTTPResponse:
+        """send a request, retrying idempotent ones within the deadline
+
+        Timeouts, connection errors and 5xx responses are retried with
+        jittered exponential backoff. Every attempt is limited to the time
+        left until the deadline, so no request takes longer than it.
+
+        A 503 means the bridge is over its command rate. Sending the request
+        again right away would only add to that, so it is raised instead and
+        left to the CommandScheduler to send again once its pacing allows it.
+
+        Args:
+            method (str): http method
+            address (str): The address to make the request to.
+            **kwargs: passed on to PoolManager.request
+
+        Raises:
+            BridgeUnavailable: while the circuit breaker is open
+            RateLimited: if the bridge answered 503
+
+        Returns:
+            HTTPResponse: response of the bridge
+        """
+        self._breaker.check()
+
+        try:
+            response, error = self._attempt(method, address, **kwargs)
+        except RateLimited:
+            raise
+        except BaseException:
+            # errors urllib3 doesn't wrap count too, or a trial request
+            # that raised one would keep the breaker open for good
+            self._failure()
+            raise
+
+        if response is not None and error is None and response.status < 500:
+            return response
+
+        self._failure()
+
+        if error is not None:
+            raise error
+
+        return response
+
+    def _attempt(self, method: str, address: str, **kwargs) -> tuple:
+        """send a request until it was answered, retries or deadline ran out
+
+        Args:
+            method (str): http method
+            address (str): The address to make the request to.
+            **kwargs: passed on to PoolManager.request
+
+        Raises:
+            RateLimited: if the bridge answered 503
+
+        Returns:
+            tuple: the last response and the last HTTPError, either may be None
+        """
+        attempts = 1 + (self._retries if method in self.IDEMPOTENT else 0)
+        deadline = time.monotonic() + self._deadline
+        response = None
+
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            timeout = urllib3.Timeout(
+                connect=self._bound(self._timeout.connect_timeout, remaining),
+                read=self._bound(self._timeout.read_timeout, remaining),
+            )
+            last = attempt == attempts - 1
+
+            try:
+                response = self._send(method, address, timeout=timeout, **kwargs)
+                if response.status < 500:
+                    self._breaker.success()
+                    return response, None
+                if response.status == 503:
+                    # the bridge is up, just busy
+                    self._breaker.success()
+                    raise RateLimited(
+                        "Code: 503; API error: " + response.data.decode("utf-8")
+                    )
+                error = None
+
+            except urllib3.exceptions.HTTPError as e:
+                error = e
+
+            # give up if the backoff would overrun the deadline
+            delay = min(self._max_backoff, self._backoff * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+            if last or time.monotonic() + delay >= deadline:
+                break
+
+            self._metrics.inc("huetui_request_retries", endpoint=endpoint_of(address))
+            time.sleep(delay)
+
+        return response, error
+
+    @staticmethod
+    def _bound(timeout, remaining: float) -> float:
+        """limit a configured timeout, None for no limit, to the time remaining"""
+        if not isinstance(timeout, (int, float)):
+            return remaining
+        return min(timeout, remaining)
+
+    def _failure(self) -> None:
+        """record a request that failed in the circuit breaker"""
+        if self._breaker.failure():
+            self._metrics.inc("huetui_breaker_opened")
+
+    def _send(self, method: str, address: str, **kwargs) -> urllib3.HTTPResponse:
+        """send a single request and record it in the metrics
+
+        Args:
+            method (str): http method
+            address (str): The address to make the request to.
+            **kwargs: passed on to PoolManager.request
+
+        Returns:
+            HTTPResponse: response of the bridge
+        """
+        labels = {"method": method, "endpoint": endpoint_of(address)}
+        start = time.perf_counter()
+
+        try:
+            response = self._http.request(method, address, **kwargs)
+
+        except (urllib3.exceptions.TimeoutError, urllib3.exceptions.MaxRetryError) as e:
+            if isinstance(e, urllib3.exceptions.TimeoutError) or isinstance(
+                e.reason, urllib3.exceptions.TimeoutError
+            ):
+                self._metrics.inc("huetui_request_timeouts", **labels)
+            self._metrics.inc("huetui_request_errors", **labels)
+            raise
+
+        except Exception:
+            self._metrics.inc("huetui_request_errors", **labels)
+            raise
+
+        finally:
+            self._metrics.inc("huetui_requests", **labels)
+            self._metrics.observe(
+                "huetui_request_duration_seconds", time.perf_counter() - start, **labels
+            )
+
+        self._metrics.inc("huetui_bytes_sent", len(kwargs.get("body") or ""), **labels)
+        self._metrics.inc("huetui_bytes_received", len(response.data), **labels)
+
+        # the bridge reports most errors with status 200
+        if response.status != 200 or response.data.startswith(b'[{"error":'):
+            self._metrics.inc("huetui_request_errors", **labels)
+
+        return response
+
+    @property
+    def timeout(self) -> urllib3.Timeout:
+        return self._timeout
+
+    def get(self, address: str) -> dict:
+        """Make a get request to the given address.
+
+        Concurrent gets of the same address share one request. The callers
+        that joined it get a copy of its response.
+
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            dict: response from api.
+        """
+        if not address:
+            raise MissingParameter("adress")
+
+        labels = {"endpoint": endpoint_of(address)}
+
+        with self._flights_lock:
+            flight = self._flights.get(address)
+            leader = flight is None
+            if leader:
+                flight = self._flights[address] = Future()
+                flight.joined = 0
+            else:
+                flight.joined += 1
+
+        if not leader:
+            self._metrics.inc("huetui_shared_gets", result="joined", **labels)
+            return copy.deepcopy(flight.result())
+
+        self._metrics.inc("huetui_shared_gets", result="sent", **labels)
+        try:
+            payload = self._get(address)
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[address]
+                joined = flight.joined
+
+        flight.set_result(payload)
+
+        # the joiners copy the response, keep it untouched for them
+        return copy.deepcopy(payload) if joined else payload
+
+    def _get(self, address: str) -> dict:
+        """send a get request
+
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            dict: response from api.
+        """
+        response = self._request("GET", address)
+
+        # check if response ok
+        if (response.status == 200) and not (
+            response.data.decode("utf-8").startswith('[{"error":')
+        ):
+            payload = json.loads(response.data.decode("utf-8"))
+            return dict(payload)
+
+        else:
+            raise Exception(
+                "Code: "
+                + str(response.status)
+                + "; API error: "
+                + response.data.decode("utf-8")
+            )
+
+    def put(self, address: str, data: str) -> bool:
+        """Make a put request to the given address.
+
+        Args:
+            address (string): The address to make the request to.
+            data (string): The data to put.
+
+        Returns:
+            bool: put successfull.
+        """
+        if address and data:
+            response = self._request(
+                "PUT",
+                address,
+                body=data,
+                headers={**self._headers, "Content-Type": "application/json"},
+            )
+
+            if (response.status == 200) and (
+                response.data.decode("utf-8").startswith('[{"success":')
+            ):
+                return True
+            else:
+                raise Exception(
+                    "Code: "
+                    + str(response.status)
+                    + "; API error: "
+                    + response.data.decode("utf-8")
+                )
+
+        else:
+            raise MissingParameter("adress or data")
+
+    def post(self, address: str, data: str) -> list:
+        """Make a post request to the given address.
+
+        Args:
+            address (string): The address to make the request to.
+            data (string): The data to post.
+
+        Returns:
+            list: response from api, e.g. [{"success": {"id": "7"}}].
+        """
+        if address and data:
+            response = self._request(
+                "POST",
+                address,
+                body=data,
+                headers={**self._headers, "Content-Type": "application/json"},
+            )
+
+            if (response.status == 200) and (
+                response.data.decode("utf-8").startswith('[{"success":')
+            ):
+                return json.loads(response.data.decode("utf-8"))
+            else:
+                raise Exception(
+                    "Code: "
+                    + str(response.status)
+                    + "; API error: "
+                    + response.data.decode("utf-8")
+                )
+
+        else:
+            raise MissingParameter("adress or data")
+
+    def delete(self, address: str) -> bool:
+        """Make a delete request to the given address.
+
+        Args:
+            address (string): The address to make the request to.
+
+        Returns:
+            bool: delete successfull.
+        """
+        if address:
+            response = self._request("DELETE", address)
+
+            if (response.status == 200) and (
+                response.data.decode("utf-8").startswith('[{"success":')
+            ):
+                return True
+            else:
+                raise Exception(
+                    "Code: "
+                    + str(response.status)
+                    + "; API error: "
+                    + response.data.decode("utf-8")
+                )
+
+        else:
+            raise MissingParameter("adress")
+
+    def close(self) -> None:
+        """close all pooled connections"""
+        self._http.clear()
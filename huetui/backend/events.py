@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, NamedTuple
+import threading
+
+
+class Delta(NamedTuple):
+    """Named tuple for the old and new value of a changed field.
+
+    Args:
+        NamedTuple (class): inherits from NamedTuple
+    """
+
+    old: Any = None
+    new: Any = None
+
+
+@dataclass
+class StateEvent:
+    """
+    Dataclass for the changes of one light or group.
+    """
+
+    resource: str
+    eid: str
+    changes: dict = field(default_factory=dict)
+
+    @property
+    def topic(self) -> str:
+        return EventBus.topic(self.resource, self.eid)
+
+
+def diff(old: dict, new: dict, prefix: str = "") -> dict:
+    """compare two api documents field by field
+
+    Args:
+        old (dict): previous document
+        new (dict): current document
+        prefix (str, optional): path of the documents. Defaults to "".
+
+    Returns:
+        dict: Delta of every changed field by dotted path, e.g. "state.on"
+    """
+    deltas = {}
+
+    for key in old.keys() | new.keys():
+        path = prefix + key
+        before = old.get(key)
+        after = new.get(key)
+
+        if isinstance(before, dict) or isinstance(after, dict):
+            deltas.update(diff(before or {}, after or {}, path + "."))
+        elif before != after:
+            deltas[path] = Delta(before, after)
+
+    return deltas
+
+
+class EventBus:
+    """Class delivering state events to subscribers by topic.
+
+    Topics are "bridge" for everything, a collection like "lights" or
+    "groups", or a single entity like "lights/3". Callbacks are called with
+    the list of events of one update that match their topic.
+
+    Attributes:
+        _subscribers (dict): callbacks by topic
+        _lock (Lock): guards _subscribers
+    """
+
+    BRIDGE = "bridge"
+
+    def __init__(self) -> None:
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def topic(resource: str, eid=None) -> str:
+        """build the topic of a collection or entity
+
+        Args:
+            resource (str): name of the collection, e.g. "lights"
+            eid (int, str, optional): id of the entity. Defaults to None.
+
+        Returns:
+            str: topic name
+        """
+        return resource if eid is None else f"{resource}/{eid}"
+
+    def subscribe(self, callback: Callable[[list], None], topic: str = BRIDGE) -> None:
+        """register a callback for a topic
+
+        Args:
+            callback (callable): called with a list of StateEvents
+            topic (str, optional): topic to subscribe to. Defaults to "bridge".
+        """
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, callback: Callable[[list], None], topic: str = BRIDGE) -> None:
+        """remove a callback registered with subscribe
+
+        Args:
+            callback (callable): callback to remove
+            topic (str, optional): topic it was subscribed to. Defaults to "bridge".
+        """
+        with self._lock:
+            callbacks = self._subscribers.get(topic, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def publish(self, events: list) -> None:
+        """deliver events to the subscribers of matching topics
+
+        Args:
+            events (list): StateEvents of one update
+        """
+        if not events:
+            return
+
+        # group the events by every topic they match
+        matches = {self.BRIDGE: list(events)}
+        for event in events:
+            matches.setdefault(event.resource, []).append(event)
+            matches.setdefault(event.topic, []).append(event)
+
+        with self._lock:
+            deliveries = [
+                (callback, matches[topic])
+                for topic, callbacks in self._subscribers.items()
+                if topic in matches
+                for callback in list(callbacks)
+            ]
+
+        for callback, matched in deliveries:
+            callback(matched)
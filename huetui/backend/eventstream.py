@@ -0,0 +1,230 @@
+from huetui.backend.utils import Util
+from huetui.backend.light import Light
+import huetui.backend.bridge as Bridge
+import json
+import threading
+import urllib3
+
+
+class EventStream(Util):
+    """Class receiving push updates from the bridge's CLIP v2 event stream.
+
+    The bridge sends server-sent events for every change of a light or
+    group. They are translated to v1 fields and applied to the bridge's
+    state store, which publishes them to its subscribers like a poll would.
+    This replaces polling entirely. The lights are refetched once after
+    every (re)connect to pick up changes missed while disconnected.
+
+    While the stream can't be read it is marked as degraded and the first
+    failure is reported to the bridge's metrics.
+
+    Args:
+        bridge (Bridge): bridge whose state store is updated
+        url (str, optional): event stream url. Defaults to https://<bridge ip>/eventstream/clip/v2.
+        app_key (str, optional): hue-application-key header. Defaults to the bridge's api user.
+        verify (bool, str, optional): verify the bridge's certificate, or a CA bundle to verify
+            it with. Defaults to False, as bridges use self-signed certificates.
+        reconnect_delay (float, optional): seconds to wait before reconnecting. Defaults to 1.0.
+        read_timeout (float, optional): seconds without data before reconnecting. Defaults to 300.
+
+    Attributes:
+        _http (PoolManager): connection pool of the long-lived stream
+        _response (HTTPResponse): currently open stream
+        _thread (Thread): thread reading the stream
+        _running (bool): whether the thread should keep reading
+        _stopped (Event): set when the stream is stopped
+        _degraded (bool): whether the last attempt to read the stream failed
+    """
+
+    def __init__(
+        self,
+        bridge: Bridge,
+        url: str = None,
+        app_key: str = None,
+        verify=False,
+        reconnect_delay: float = 1.0,
+        read_timeout: float = 300.0,
+    ) -> None:
+        address = urllib3.util.parse_url(bridge.url)
+
+        self._bridge = bridge
+        self._url = url or f"https://{address.netloc}/eventstream/clip/v2"
+        self._app_key = app_key or address.path.rstrip("/").split("/")[-1]
+        self._reconnect_delay = reconnect_delay
+
+        if verify is False:
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        self._http = urllib3.PoolManager(
+            cert_reqs="CERT_REQUIRED" if verify else "CERT_NONE",
+            ca_certs=verify if isinstance(verify, str) else None,
+            timeout=urllib3.Timeout(connect=5.0, read=read_timeout),
+            retries=False,
+        )
+
+        self._response = None
+        self._thread = None
+        self._running = False
+        self._stopped = threading.Event()
+        self._degraded = False
+
+    @property
+    def degraded(self) -> bool:
+        return self._degraded
+
+    def start(self) -> None:
+        """start reading the event stream"""
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """stop reading the event stream"""
+        self._running = False
+        self._stopped.set()
+
+        # interrupt the blocking read
+        response = self._response
+        if response is not None:
+            try:
+                response.shutdown()
+            except Exception:
+                pass
+
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self) -> None:
+        """connect, read and reconnect until stopped"""
+        # the catch-up refreshes yield to requests made by key handlers
+        with self._bridge.background():
+            while self._running:
+                try:
+                    self._read_stream()
+                except Exception as e:
+                    # report once per outage, not on every reconnect
+                    if self._running and not self._degraded:
+                        self._bridge.metrics.error(e)
+                    self._degraded = self._running
+
+                self._stopped.wait(self._reconnect_delay)
+
+    def _read_stream(self) -> None:
+        """read server-sent events until the stream ends"""
+        self._response = self._http.request(
+            "GET",
+            self._url,
+            headers={
+                "hue-application-key": self._app_key,
+                "Accept": "text/event-stream",
+            },
+            preload_content=False,
+        )
+
+        try:
+            if self._response.status != 200:
+                raise Exception("Code: " + str(self._response.status))
+
+            # events sent while disconnected are lost
+            self._bridge.state.refresh("lights")
+            self._degraded = False
+
+            data = []
+            for line in self._lines():
+                # an empty line terminates an event
+                if not line:
+                    if data:
+                        self.handle_message(json.loads("\n".join(data)))
+                    data = []
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+
+        finally:
+            self._response.release_conn()
+            self._response = None
+
+    def _lines(self):
+        """yield the decoded lines of the stream as they arrive"""
+        buffer = b""
+
+        while self._running:
+            chunk = self._response.read1(65536)
+            if not chunk:
+                return
+
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.rstrip(b"\r").decode("utf-8")
+
+    def handle_message(self, message: list) -> None:
+        """apply one event stream message to the state store
+
+        Args:
+            message (list): events of the message as sent by the bridge
+        """
+        for event in message:
+            if event.get("type") != "update":
+                continue
+
+            for resource in event.get("data", []):
+                self.handle_resource(resource)
+
+    def handle_resource(self, resource: dict) -> None:
+        """translate one updated v2 resource to v1 fields
+
+        Args:
+            resource (dict): resource as sent by the bridge
+        """
+        id_v1 = resource.get("id_v1", "")
+        if id_v1.count("/") != 2:
+            return
+
+        collection, eid = id_v1.strip("/").split("/")
+        state = self._bridge.state
+
+        if resource.get("type") == "light" and collection == "lights":
+            changes = {}
+            if "on" in resource:
+                changes["on"] = resource["on"]["on"]
+            if "dimming" in resource:
+                changes["bri"] = self.percent_to_value(
+                    resource["dimming"]["brightness"], 255
+                )
+            if "color" in resource:
+                x = resource["color"]["xy"]["x"]
+                y = resource["color"]["xy"]["y"]
+                changes["xy"] = [x, y]
+
+                # hue and saturation aren't part of v2, derive them
+                hsv = Light.rgb_to_hsv(*Light.xy_to_rgb(x, y))
+                changes["hue"] = hsv.h
+                changes["sat"] = self.percent_to_value(hsv.s, 255)
+            if "color_temperature" in resource:
+                changes["ct"] = resource["color_temperature"].get("mirek")
+
+            state.update("lights", eid, "state", changes)
+
+        elif resource.get("type") == "zigbee_connectivity" and collection == "lights":
+            state.update(
+                "lights",
+                eid,
+                "state",
+                {"reachable": resource.get("status") == "connected"},
+            )
+
+        elif resource.get("type") == "grouped_light" and collection == "groups":
+            if "on" in resource:
+                state.update("groups", eid, "state", {"any_on": resource["on"]["on"]})
+                state.invalidate("groups")
+            if "dimming" in resource:
+                state.update(
+                    "groups",
+                    eid,
+                    "action",
+                    {"bri": self.percent_to_value(resource["dimming"]["brightness"], 255)},
+                )
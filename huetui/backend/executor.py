@@ -0,0 +1,120 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, NamedTuple
+from huetui.backend.trace import tracer
+import queue
+import threading
+
+
+class Result(NamedTuple):
+    """Outcome of a command run by the CommandExecutor."""
+
+    description: str
+    value: Any
+    error: Exception
+
+
+class CommandExecutor:
+    """Runs bridge commands on a worker pool instead of the UI thread.
+
+    Commands submitted with the same key run one after another in
+    submission order, e.g. repeated brightness steps of one light.
+    Commands with different keys run concurrently. Results are collected
+    in a queue the UI thread drains when it redraws.
+
+    Args:
+        workers (int, optional): number of worker threads. Defaults to 4.
+
+    Attributes:
+        _pool (ThreadPoolExecutor): worker threads
+        _results (SimpleQueue): finished commands waiting to be drained
+        _lanes (dict): queued commands per key
+        _pending (int): commands submitted but not finished
+        _lock (Lock): guards the lanes and the pending count
+    """
+
+    def __init__(self, workers: int = 4) -> None:
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="huetui-command")
+        self._results = queue.SimpleQueue()
+        self._lanes = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, description: str, func, *args, key: str = None, **kwargs) -> None:
+        """queue a command
+
+        Args:
+            description (str): shown with the result of the command
+            func (callable): the command
+            *args: passed on to func
+            key (str, optional): commands with the same key run in order. Defaults to None.
+            **kwargs: passed on to func
+        """
+        keypress = tracer.current()
+        tracer.flow(keypress)
+        command = (description, func, args, kwargs, keypress)
+
+        with self._lock:
+            self._pending += 1
+            if key is None:
+                self._pool.submit(self._run, command)
+                return
+
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append(command)
+                return
+
+            self._lanes[key] = deque([command])
+
+        self._pool.submit(self._run_lane, key)
+
+    def _run(self, command: tuple) -> None:
+        """run a command and queue its result"""
+        description, func, args, kwargs, keypress = command
+
+        try:
+            with tracer.resume(keypress, description):
+                value = func(*args, **kwargs)
+            self._results.put(Result(description, value, None))
+        except Exception as e:
+            self._results.put(Result(description, None, e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run_lane(self, key: str) -> None:
+        """run the commands of a key until none are left"""
+        while True:
+            with self._lock:
+                lane = self._lanes[key]
+                if not lane:
+                    del self._lanes[key]
+                    return
+                command = lane[0]
+
+            self._run(command)
+
+            with self._lock:
+                lane.popleft()
+
+    def drain(self) -> list:
+        """take the results of the finished commands
+
+        Returns:
+            list: Result of every command finished since the last call
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def shutdown(self) -> None:
+        """run the queued commands and stop the workers"""
+        self._pool.shutdown(wait=True)
@@ -1,4 +1,7 @@
 from huetui.backend.utils import Util
+from huetui.backend.events import EventBus
+from huetui.backend.light import Light, RGB
+import json
 import huetui.backend.bridge as Bridge
 
 
@@ -16,7 +19,9 @@ class Group(Util):
         _all_on (bool): on/off state of the group
     """
 
-    def __init__(self, bridge: Bridge, gid: int, name: str, lights: list) -> None:
+    def __init__(
+        self, bridge: Bridge, gid: int, name: str, lights: list, data: dict = None
+    ) -> None:
         self._bridge = bridge
         self._gid = gid
         self._name = name
@@ -24,6 +29,12 @@ class Group(Util):
         self._all_on = None
         self._brightness = None
 
+        # hydrate initial values from the payload the bridge already fetched
+        if data is not None:
+            self._all_on = data.get("state", {}).get("all_on")
+            if data.get("action", {}).get("bri") is not None:
+                self._brightness = self.value_to_percent(data["action"]["bri"], 255)
+
     def __str__(self) -> str:
         return "<class 'Group'> gid: {}".format(self._gid)
 
@@ -34,8 +45,17 @@ class Group(Util):
     def gid(self) -> int:
         return self._gid
 
+    @property
+    def topic(self) -> str:
+        return EventBus.topic("groups", self._gid)
+
     @property
     def name(self) -> str:
+        # follow renames picked up by a refresh
+        document = self._bridge.state.peek("groups", self._gid)
+        if document is not None:
+            self._name = document.get("name", self._name)
+
         return self._name
 
     @property
@@ -46,8 +66,9 @@ class Group(Util):
     def all_on(self) -> bool:
 
         try:
-            addr = self._bridge._url + f"/groups/{self._gid}"
-            self._all_on = self._bridge.api_get(addr)["state"]["all_on"]
+            self._all_on = self._bridge.state.entity("groups", self._gid)["state"][
+                "all_on"
+            ]
 
         except Exception:
             pass
@@ -56,15 +77,13 @@ class Group(Util):
 
     @all_on.setter
     def all_on(self, value: bool) -> None:
-        for light in self._lights:
-            light.on = value
+        self.set_action({"on": value})
 
     @property
     def brightness(self) -> int:
         try:
-            addr = self._bridge._url + f"/groups/{self._gid}"
             self._brightness = self.value_to_percent(
-                self.api_get(addr)["action"]["bri"], 255
+                self._bridge.state.entity("groups", self._gid)["action"]["bri"], 255
             )
 
         except Exception:
@@ -74,8 +93,80 @@ class Group(Util):
 
     @brightness.setter
     def brightness(self, value: int) -> None:
+        self.set_brightness(value)
+
+    def set_brightness(self, value: int, transitiontime: int = None) -> None:
+        """set the brightness of all lights of the group with one request
+
+        Args:
+            value (int): brightness in percent
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
         if value > 0 and value <= 100:
             self._brightness = value
-            addr = self._bridge._url + f"/groups/{self._gid}/action"
             val = self.percent_to_value(self._brightness, 255)
-            self.api_put(addr, f'{{"bri": {val}}}')
+            self.set_action({"bri": val}, transitiontime)
+
+    def set_color(self, rgb: RGB) -> None:
+        """switch on all lights of the group and set their color with one request
+
+        Args:
+            rgb (RGB): color to set
+        """
+        hsv = Light.rgb_to_hsv(rgb.r, rgb.g, rgb.b)
+        self.set_action(
+            {
+                "on": True,
+                "hue": hsv.h,
+                "sat": self.percent_to_value(hsv.s, 255),
+                "bri": self.percent_to_value(hsv.v, 255),
+            }
+        )
+
+    def set_action(self, changes: dict, transitiontime: int = None) -> None:
+        """set the same state on all lights of the group with one request
+
+        Lights that need different states still have to be set one by one,
+        e.g. with Bridge.transaction().
+
+        Args:
+            changes (dict): v1 state values, e.g. {"on": True, "bri": 254}
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        # skip what all lights of the group already have
+        changes = self._bridge.filter_write(self._lights, changes)
+        if not changes:
+            return
+
+        addr = self._bridge._url + f"/groups/{self._gid}/action"
+
+        # show the change on the group and its lights right away, the
+        # bridge confirms or rolls it back
+        patches = [("groups", self._gid, "action", changes)]
+        if "on" in changes:
+            patches.append(
+                (
+                    "groups",
+                    self._gid,
+                    "state",
+                    {"all_on": changes["on"], "any_on": changes["on"]},
+                )
+            )
+        patches += [("lights", light.lid, "state", changes) for light in self._lights]
+
+        body = dict(changes)
+        if transitiontime is not None:
+            body["transitiontime"] = transitiontime
+
+        with self._bridge.optimistic(patches):
+            self._bridge.api_put(addr, json.dumps(body))
+
+    def step_brightness(self, step: int, transitiontime: int = None) -> None:
+        """change the brightness by a step, clamped to 1-100%
+
+        Args:
+            step (int): percent to add, negative to dim
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        if self.brightness is not None:
+            self.set_brightness(min(100, max(1, self.brightness + step)), transitiontime)
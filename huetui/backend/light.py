@@ -1,8 +1,12 @@
 from typing import NamedTuple
 from huetui.backend.utils import Util
+from huetui.backend.events import EventBus
+from contextlib import contextmanager
 from enum import Enum
 import huetui.backend.bridge as Bridge
 import colorsys
+import json
+import threading
 
 
 class RGB(NamedTuple):
@@ -40,6 +44,7 @@ class Parameter(Enum):
     HUE = "hue"
     SATURATION = "sat"
     REACHABLE = "reachable"
+    TRANSITION_TIME = "transitiontime"
 
 
 class Light(Util):
@@ -58,14 +63,17 @@ class Light(Util):
         _saturation (int): saturation of the light
         _color (str): color of the light as rgb
         _reachable (bool): reachable state of the light
+        _batches (local): per thread, the number of open batch() blocks and
+            the parameter changes not yet sent to the bridge
     """
 
-    def __init__(self, bridge: Bridge, lid: int):
+    def __init__(self, bridge: Bridge, lid: int, data: dict = None):
         """Contructor for Light class
 
         Args:
             bridge (class): bridge the light is connected to
             lid (int): id of the light
+            data (dict, optional): the light's entry of the bulk /lights payload. Defaults to None.
         """
         self._bridge = bridge
 
@@ -80,16 +88,11 @@ class Light(Util):
 
         self._reachable = None
 
-        # try to get initial values from api
-        try:
-            self._on = self.get_api_param(Parameter.ON)
-            self._brightness = self.get_api_param(Parameter.BRIGHTNESS)
-            self._hue = self.get_api_param(Parameter.HUE)
-            self._saturation = self.get_api_param(Parameter.SATURATION)
-            self._reachable = self.get_api_param(Parameter.REACHABLE)
+        self._batches = threading.local()
 
-        except Exception:
-            pass
+        # hydrate initial values from the payload the bridge already fetched
+        if data is not None:
+            self._hydrate(data)
 
     def __str__(self) -> str:
         return "<class 'Light'> lid: {}".format(self._lid)
@@ -97,31 +100,119 @@ class Light(Util):
     def __repr__(self) -> str:
         return "<class 'Light'> lid: {}".format(self._lid)
 
-    def put_api_param(self, param: Parameter, value: str):
+    def _hydrate(self, data: dict) -> None:
+        """Set the cached values from the light's api document
+
+        Args:
+            data (dict): the light's entry of the /lights payload
+        """
+        state = data.get("state", {})
+
+        self._name = data.get(Parameter.NAME.value)
+        self._on = state.get(Parameter.ON.value)
+        self._hue = state.get(Parameter.HUE.value)
+        self._reachable = state.get(Parameter.REACHABLE.value)
+
+        # convert values to percent
+        if state.get(Parameter.BRIGHTNESS.value) is not None:
+            self._brightness = self.value_to_percent(
+                state[Parameter.BRIGHTNESS.value], 255
+            )
+        if state.get(Parameter.SATURATION.value) is not None:
+            self._saturation = self.value_to_percent(
+                state[Parameter.SATURATION.value], 255
+            )
+
+    def _batch(self):
+        """the calling thread's batch state of the light"""
+        batch = self._batches
+        if not hasattr(batch, "depth"):
+            batch.depth = 0
+            batch.pending = {}
+        return batch
+
+    @property
+    def _pending(self) -> dict:
+        return self._batch().pending
+
+    def put_api_param(self, param: Parameter, value) -> bool:
         """Update the light's state on the bridge
 
+        Inside a batch() block the change is only queued and sent together
+        with all other changes of the same thread once the block exits.
+        Changes made by other threads meanwhile are sent right away.
+
         Args:
             param (str): parameter to update
-            value (str): value to update the parameter to
+            value (bool, int): value to update the parameter to
+
+        Returns:
+            bool: update successfull (or queued)
+        """
+        batch = self._batch()
+        batch.pending[param.value] = value
+
+        if batch.depth > 0:
+            return True
+
+        return self.flush()
+
+    def flush(self) -> bool:
+        """Send the calling thread's pending parameter changes with a single request
+
+        The changes are applied to the state store before the request is
+        sent and rolled back if it fails.
 
         Returns:
             bool: update successfull
         """
-        try:
+        batch = self._batch()
+        changes, batch.pending = batch.pending, {}
+        if not changes:
+            return True
 
-            data = f'{{"{param.value}":{value}}}'
-            addr = self._bridge.url + f"/lights/{self._lid}/state"
+        # skip what the light already has
+        changes = self._bridge.filter_write([self], changes)
+        if not changes:
+            return True
 
-            self.api_put(addr, data)
+        addr = self._bridge.url + f"/lights/{self._lid}/state"
+
+        # show the change right away, the bridge confirms or rolls it back
+        try:
+            with self._bridge.optimistic([("lights", self._lid, "state", changes)]):
+                self._bridge.api_put(addr, json.dumps(changes))
 
             return True
 
         except Exception as e:
-            print(e)
+            entity = self._bridge.state.peek("lights", self._lid)
+            if entity is not None:
+                self._hydrate(entity)
+            self._bridge.metrics.error(e)
             return False
 
+    @contextmanager
+    def batch(self):
+        """Merge all parameter changes made inside the block into one request
+
+        Example:
+            with light.batch():
+                light.on = True
+                light.color = RGB(255, 0, 0)
+        """
+        batch = self._batch()
+        batch.depth += 1
+
+        try:
+            yield self
+        finally:
+            batch.depth -= 1
+            if batch.depth == 0:
+                self.flush()
+
     def get_api_param(self, param: Parameter):
-        """Get the light's parameter from the api
+        """Get the light's parameter from the bridge's state store
 
         Args:
             param (str): parameter to get
@@ -129,12 +220,32 @@ class Light(Util):
         Returns:
             bool, str, int: value of the parameter
         """
-        addr = self._bridge.url + f"/lights/{self._lid}"
+        resp_dict = self._bridge.state.entity("lights", self._lid)
 
-        resp_dict = self.api_get(addr)
-        val = resp_dict["state"][param.value]
+        if param is Parameter.NAME:
+            return resp_dict[param.value]
 
-        return val
+        return resp_dict["state"][param.value]
+
+    def get_cached_param(self, param: Parameter, default=None):
+        """Get the light's parameter from the state store without refetching it
+
+        Args:
+            param (str): parameter to get
+            default (optional): returned if the light was never fetched. Defaults to None.
+
+        Returns:
+            bool, str, int: value of the parameter
+        """
+        resp_dict = self._bridge.state.peek("lights", self._lid)
+
+        if resp_dict is None:
+            return default
+
+        if param is Parameter.NAME:
+            return resp_dict.get(param.value, default)
+
+        return resp_dict.get("state", {}).get(param.value, default)
 
     @staticmethod
     def hsv_to_rgb(h: int, s: int, v: int) -> RGB:
@@ -182,10 +293,49 @@ class Light(Util):
 
         return HSV(round(h * 65535), round(s * 100), round(v * 100))
 
+    @staticmethod
+    def xy_to_rgb(x: float, y: float) -> RGB:
+        """Converts a CIE xy color to rgb(255,255,255) at full brightness
+
+        Args:
+            x (float): x coordinate
+            y (float): y coordinate
+
+        Returns:
+            RGB: red, green and blue, as a namedtuple
+        """
+        if y <= 0:
+            return RGB(255, 255, 255)
+
+        # xyY to XYZ
+        X = x / y
+        Z = (1 - x - y) / y
+
+        # XYZ to linear rgb (wide gamut D65)
+        rgb = (
+            X * 1.656492 - 0.354851 - Z * 0.255038,
+            -X * 0.707196 + 1.655397 + Z * 0.036152,
+            X * 0.051713 - 0.121364 + Z * 1.011530,
+        )
+        rgb = [max(0.0, value) for value in rgb]
+        brightest = max(rgb) or 1.0
+
+        # gamma correction
+        rgb = [
+            12.92 * value if value <= 0.0031308 else 1.055 * value ** (1 / 2.4) - 0.055
+            for value in (value / brightest for value in rgb)
+        ]
+
+        return RGB(*(round(value * 255) for value in rgb))
+
     @property
     def lid(self) -> int:
         return self._lid
 
+    @property
+    def topic(self) -> str:
+        return EventBus.topic("lights", self._lid)
+
     @property
     def on(self) -> bool:
         # try to get value from api
@@ -199,21 +349,12 @@ class Light(Util):
     @on.setter
     def on(self, value: bool) -> None:
         self._on = value
-        self.put_api_param(Parameter.ON, str(self._on).lower())
+        self.put_api_param(Parameter.ON, self._on)
 
     @property
     def name(self) -> str:
-        # try to get value from api
-        try:
-            addr = self._bridge.url + f"/lights/{self._lid}"
-
-            resp_dict = self.api_get(addr)
-            val = resp_dict[Parameter.NAME.value]
-            self._name = val
-
-        except Exception as e:
-            pass
-
+        # follow renames picked up by a refresh
+        self._name = self.get_cached_param(Parameter.NAME, self._name)
         return self._name
 
     @property
@@ -232,12 +373,31 @@ class Light(Util):
     @brightness.setter
     def brightness(self, value: int) -> None:
         # convert percentage to value (0-255)
-        if value > 0 and value <= 100 and self.on and self.reachable:
+        on = self.get_cached_param(Parameter.ON, self._on)
+        reachable = self.get_cached_param(Parameter.REACHABLE, self._reachable)
+        if value > 0 and value <= 100 and on and reachable:
             self._brightness = value
             self.put_api_param(
                 Parameter.BRIGHTNESS, self.percent_to_value(self._brightness, 255)
             )
 
+    def step_brightness(self, step: int, transitiontime: int = None) -> None:
+        """change the brightness by a step, clamped to 1-100%
+
+        Args:
+            step (int): percent to add, negative to dim
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        current = self.get_cached_param(Parameter.BRIGHTNESS)
+        current = self._brightness if current is None else self.value_to_percent(current, 255)
+        if current is None:
+            return
+
+        with self.batch():
+            self.brightness = min(100, max(1, current + step))
+            if transitiontime is not None and self._pending:
+                self.put_api_param(Parameter.TRANSITION_TIME, transitiontime)
+
     @property
     def hue(self) -> int:
         # try to get value from api
@@ -304,14 +464,15 @@ class Light(Util):
         self._saturation = hsv.s
         self._brightness = hsv.v
 
-        # update api
-        self.put_api_param(Parameter.HUE, self._hue)
-        self.put_api_param(
-            Parameter.SATURATION, self.percent_to_value(self._saturation, 255)
-        )
-        self.put_api_param(
-            Parameter.BRIGHTNESS, self.percent_to_value(self._brightness, 255)
-        )
+        # update api with a single request
+        with self.batch():
+            self.put_api_param(Parameter.HUE, self._hue)
+            self.put_api_param(
+                Parameter.SATURATION, self.percent_to_value(self._saturation, 255)
+            )
+            self.put_api_param(
+                Parameter.BRIGHTNESS, self.percent_to_value(self._brightness, 255)
+            )
 
     @property
     def reachable(self) -> bool:
@@ -325,4 +486,4 @@ class Light(Util):
 
     def toggle(self) -> None:
         """toggle a light on or off"""
-        self.on = not self.on
+        self.on = not self.get_cached_param(Parameter.ON, self._on)
@@ -0,0 +1,319 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import path, makedirs
+import re
+import threading
+
+
+# latency buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def endpoint_of(address: str) -> str:
+    """reduce a bridge address to its endpoint pattern
+
+    Args:
+        address (str): e.g. "http://10.0.0.2/api/<user>/lights/3/state"
+
+    Returns:
+        str: e.g. "/lights/{id}/state"
+    """
+    match = re.match(r"^\w+://[^/]+/api/[^/]+(/.*)?$", address)
+    if match:
+        resource = match.group(1) or "/"
+    else:
+        resource = re.sub(r"^\w+://[^/]+", "", address)
+
+    return re.sub(r"^(/\w+)/[^/]+", r"\1/{id}", resource)
+
+
+class Histogram:
+    """Cumulative histogram of observed values.
+
+    Args:
+        buckets (tuple, optional): upper bounds of the buckets. Defaults to BUCKETS.
+
+    Attributes:
+        counts (list): observations per bucket, the last one is +Inf
+        sum (float): sum of all observations
+        count (int): number of observations
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """add an observation
+
+        Args:
+            value (float): observed value
+        """
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """estimate a quantile from the buckets
+
+        Args:
+            q (float): quantile between 0 and 1
+
+        Returns:
+            float: upper bound of the bucket holding the quantile
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, bound in enumerate(self.buckets):
+            seen += self.counts[i]
+            if seen >= rank:
+                return bound
+
+        return float("inf")
+
+
+class Metrics:
+    """Registry of counters and histograms describing the bridge traffic.
+
+    Metrics are identified by name and labels. They can be shown as a
+    summary, exported as OpenMetrics text to a file or served on a local
+    /metrics endpoint.
+
+    Attributes:
+        _counters (dict): counter values by name and labels
+        _histograms (dict): histograms by name and labels
+        _help (dict): description of each metric family
+        _lock (Lock): guards the metrics
+        last_error (str): message of the most recent failed command
+    """
+
+    def __init__(self) -> None:
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self.last_error = None
+        self.describe("huetui_command_failures", "bridge commands that failed")
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def describe(self, name: str, text: str) -> None:
+        """set the help text of a metric family
+
+        Args:
+            name (str): metric name
+            text (str): help text
+        """
+        self._help[name] = text
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """increase a counter
+
+        Args:
+            name (str): counter name without the _total suffix
+            value (float, optional): amount to add. Defaults to 1.
+            **labels: labels of the counter
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """add an observation to a histogram
+
+        Args:
+            name (str): histogram name
+            value (float): observed value
+            **labels: labels of the histogram
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+            self._histograms[key].observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """sum of all counters of a name matching the labels
+
+        Args:
+            name (str): counter name
+            **labels: labels to filter by
+
+        Returns:
+            float: summed value
+        """
+        with self._lock:
+            return sum(
+                value
+                for (n, key_labels), value in self._counters.items()
+                if n == name and labels.items() <= dict(key_labels).items()
+            )
+
+    def error(self, e: Exception) -> None:
+        """record a failed command
+
+        Args:
+            e (Exception): the failure
+        """
+        self.last_error = str(e)
+        self.inc("huetui_command_failures")
+
+    @staticmethod
+    def _labels(labels: tuple, extra: dict = None) -> str:
+        pairs = list(labels) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def to_openmetrics(self) -> str:
+        """export all metrics in the OpenMetrics text format
+
+        Returns:
+            str: exposition text
+        """
+        lines = []
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+
+        families = {}
+        for (name, labels), value in counters:
+            families.setdefault(("counter", name), []).append(
+                f"{name}_total{self._labels(labels)} {value}"
+            )
+
+        for (name, labels), histogram in histograms:
+            samples = families.setdefault(("histogram", name), [])
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                cumulative += count
+                samples.append(
+                    f"{name}_bucket{self._labels(labels, {'le': bound})} {cumulative}"
+                )
+            samples.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+            samples.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+
+        for (kind, name), samples in families.items():
+            lines.append(f"# TYPE {name} {kind}")
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.extend(samples)
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file: str) -> None:
+        """write the OpenMetrics export to a file
+
+        Args:
+            file (str): path of the file
+        """
+        file = path.expanduser(file)
+        if path.dirname(file) and not path.exists(path.dirname(file)):
+            makedirs(path.dirname(file))
+
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+
+    def summary(self) -> list:
+        """describe the traffic per endpoint for the stats panel
+
+        Returns:
+            list: one line per endpoint and a few totals
+        """
+        with self._lock:
+            histograms = [
+                (dict(labels), histogram)
+                for (name, labels), histogram in sorted(
+                    self._histograms.items(), key=lambda item: item[0]
+                )
+                if name == "huetui_request_duration_seconds"
+            ]
+
+        lines = []
+        for labels, histogram in histograms:
+            errors = self.counter("huetui_request_errors", **labels)
+            lines.append(
+                f"{labels['method']:<4} {labels['endpoint']:<22}"
+                f" n={histogram.count:<6} err={errors:<4.0f}"
+                f" avg={histogram.sum / histogram.count * 1000:.0f}ms"
+                f" p95<={histogram.quantile(0.95) * 1000:.0f}ms"
+            )
+
+        lines.append(
+            f"timeouts: {self.counter('huetui_request_timeouts'):.0f}"
+            f"  retries: {self.counter('huetui_request_retries'):.0f}"
+            f"  degraded: {self.counter('huetui_breaker_opened'):.0f}x"
+            f"  failed commands: {self.counter('huetui_command_failures'):.0f}"
+        )
+        lines.append(
+            f"bytes out: {self.counter('huetui_bytes_sent'):.0f}"
+            f"  bytes in: {self.counter('huetui_bytes_received'):.0f}"
+        )
+        sent = self.counter("huetui_shared_gets", result="sent")
+        joined = self.counter("huetui_shared_gets", result="joined")
+        lines.append(
+            f"shared gets: {joined:.0f} of {sent + joined:.0f}"
+            f" ({joined / max(1, sent + joined):.0%})"
+        )
+        lines.append(
+            f"writes saved: {self.counter('huetui_writes_saved'):.0f}"
+            f"  fields saved: {self.counter('huetui_fields_saved'):.0f}"
+        )
+        if self.last_error:
+            lines.append(f"last error: {self.last_error}")
+
+        return lines
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """serve the OpenMetrics export on http://host:port/metrics
+
+        Args:
+            port (int): port to listen on
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                data = metrics.to_openmetrics().encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type",
+                    "application/openmetrics-text; version=1.0.0; charset=utf-8",
+                )
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop_serving(self) -> None:
+        """stop the /metrics endpoint"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
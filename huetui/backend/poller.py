@@ -0,0 +1,113 @@
+import huetui.backend.bridge as Bridge
+import threading
+
+
+class StatePoller:
+    """Class keeping the bridge's state store fresh from one background thread.
+
+    Each tick refetches the polled collections with one request each. The
+    store diffs them against the previous snapshot and notifies its
+    subscribers about the changed entities only. While nothing changes the
+    interval backs off up to max_interval, any change resets it.
+
+    Args:
+        bridge (Bridge): bridge to poll
+        resources (tuple, optional): collections to poll. Defaults to ("lights",).
+        min_interval (float, optional): seconds between polls while state changes. Defaults to 0.2.
+        max_interval (float, optional): seconds between polls while idle. Defaults to 1.0.
+        backoff (float, optional): factor the interval grows by per idle poll. Defaults to 1.5.
+
+    Attributes:
+        _interval (float): seconds until the next poll
+        _wakeup (Event): set to poll right away or to stop
+        _thread (Thread): polling thread
+        _running (bool): whether the thread should keep polling
+        _degraded (bool): whether the last poll failed
+    """
+
+    def __init__(
+        self,
+        bridge: Bridge,
+        resources: tuple = ("lights",),
+        min_interval: float = 0.2,
+        max_interval: float = 1.0,
+        backoff: float = 1.5,
+    ) -> None:
+        self._bridge = bridge
+        self._resources = resources
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+        self._interval = min_interval
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+        self._degraded = False
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    @property
+    def degraded(self) -> bool:
+        return self._degraded
+
+    def start(self) -> None:
+        """start the polling thread"""
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """stop the polling thread"""
+        self._running = False
+        self._wakeup.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def wake(self) -> None:
+        """poll right away, e.g. after the state was changed elsewhere"""
+        self._interval = self._min_interval
+        self._wakeup.set()
+
+    def poll(self) -> bool:
+        """refetch the polled collections once
+
+        Returns:
+            bool: True if any entity changed
+        """
+        changed = False
+
+        for resource in self._resources:
+            if self._bridge.state.refresh(resource):
+                changed = True
+
+        return changed
+
+    def _run(self) -> None:
+        """polling loop"""
+        # polling yields to requests made by key handlers
+        with self._bridge.background():
+            while self._running:
+                try:
+                    changed = self.poll()
+                    self._degraded = False
+                except Exception:
+                    changed = False
+                    self._degraded = True
+
+                # adapt the interval to how lively the state is
+                if changed:
+                    self._interval = self._min_interval
+                else:
+                    self._interval = min(
+                        self._interval * self._backoff, self._max_interval
+                    )
+
+                self._wakeup.wait(self._interval)
+                self._wakeup.clear()
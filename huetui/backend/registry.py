@@ -0,0 +1,266 @@
+from typing import Callable
+import threading
+
+
+class Registry:
+    """Lights, groups and scenes of a bridge indexed for constant time lookups.
+
+    Every kind of entity ("lights", "groups" or "scenes") is indexed by id
+    and by name. Lights additionally know the groups and scenes they are a
+    member of. Renames, changed members and added or removed entities
+    published on the event bus are applied to the indexes.
+
+    The lists returned by all() are replaced rather than changed when an
+    entity is added or removed, so a menu built from one keeps matching it.
+
+    Args:
+        factory (callable, optional): builds the entity of a kind and id that
+            was added on the bridge, or returns None to skip it. Defaults to
+            skipping added entities.
+
+    Attributes:
+        _factory (callable): builds entities added on the bridge
+        _entities (dict): entities in registration order by kind
+        _by_id (dict): entities by kind and id
+        _by_name (dict): entities by kind and name, first registered first
+        _groups_of (dict): groups by light id
+        _scenes_of (dict): scenes by light id
+        _lock (RLock): guards the indexes
+    """
+
+    KINDS = ("lights", "groups", "scenes")
+
+    def __init__(self, factory: Callable[[str, object], object] = None) -> None:
+        self._factory = factory
+        self._entities = {kind: [] for kind in self.KINDS}
+        self._by_id = {kind: {} for kind in self.KINDS}
+        self._by_name = {kind: {} for kind in self.KINDS}
+        self._groups_of = {}
+        self._scenes_of = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _id_of(kind: str, entity):
+        if kind == "lights":
+            return entity.lid
+        if kind == "groups":
+            return entity.gid
+        return entity.sid
+
+    def add(self, kind: str, entity, name: str = None) -> None:
+        """register an entity
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            entity (Light, Group, Scene): entity to register
+            name (str, optional): name to index it by. Defaults to entity.name.
+        """
+        name = entity.name if name is None else name
+
+        with self._lock:
+            self._entities[kind] = self._entities[kind] + [entity]
+            self._by_id[kind][self._id_of(kind, entity)] = entity
+            self._by_name[kind].setdefault(name, []).append(entity)
+
+            if kind == "groups":
+                for light in entity.lights:
+                    self._groups_of.setdefault(light.lid, []).append(entity)
+            elif kind == "scenes":
+                for light in entity.lights:
+                    self._scenes_of.setdefault(light.lid, []).append(entity)
+
+    def remove(self, kind: str, eid) -> None:
+        """unregister an entity that was deleted on the bridge
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            eid (int, str): id of the entity
+        """
+        with self._lock:
+            entity = self._by_id[kind].pop(eid, None)
+            if entity is None:
+                return
+
+            self._entities[kind] = [
+                other for other in self._entities[kind] if other is not entity
+            ]
+            for name, named in list(self._by_name[kind].items()):
+                if entity in named:
+                    named.remove(entity)
+                    if not named:
+                        del self._by_name[kind][name]
+
+            if kind == "lights":
+                # update in place, menus hold on to the lists
+                for member in self._groups_of.pop(eid, []) + self._scenes_of.pop(
+                    eid, []
+                ):
+                    member.lights.remove(entity)
+            else:
+                index = self._groups_of if kind == "groups" else self._scenes_of
+                for light in entity.lights:
+                    index[light.lid].remove(entity)
+
+    def rename(self, kind: str, eid, old: str, new: str) -> None:
+        """move an entity to its new name in the name index
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            eid (int, str): id of the entity
+            old (str): previous name
+            new (str): current name
+        """
+        with self._lock:
+            entity = self._by_id[kind].get(eid)
+            if entity is None:
+                return
+
+            named = self._by_name[kind].get(old, [])
+            if entity in named:
+                named.remove(entity)
+                if not named:
+                    del self._by_name[kind][old]
+
+            # keep the registration order among entities of the same name
+            named = self._by_name[kind].setdefault(new, [])
+            named.append(entity)
+            order = self._entities[kind]
+            named.sort(key=order.index)
+
+    def _relink(self, kind: str, eid, lids: list) -> None:
+        """replace the lights of a group or scene
+
+        Args:
+            kind (str): "groups" or "scenes"
+            eid (int, str): id of the group or scene
+            lids (list): ids of the lights now in it
+        """
+        index = self._groups_of if kind == "groups" else self._scenes_of
+
+        with self._lock:
+            entity = self._by_id[kind].get(eid)
+            if entity is None:
+                return
+
+            for light in entity.lights:
+                index[light.lid].remove(entity)
+
+            # update in place, menus hold on to the list
+            entity.lights[:] = [
+                self._by_id["lights"][lid]
+                for lid in lids
+                if lid in self._by_id["lights"]
+            ]
+
+            for light in entity.lights:
+                index.setdefault(light.lid, []).append(entity)
+
+    def regroup(self, gid: int, lids: list) -> None:
+        """replace the members of a group
+
+        Args:
+            gid (int): id of the group
+            lids (list): ids of the lights now in the group
+        """
+        self._relink("groups", gid, lids)
+
+    def rescene(self, sid: str, lids: list) -> None:
+        """replace the lights of a scene
+
+        Args:
+            sid (str): id of the scene
+            lids (list): ids of the lights now in the scene
+        """
+        self._relink("scenes", sid, lids)
+
+    def on_change(self, events: list) -> None:
+        """apply renames, member changes, additions and removals published
+        on the event bus
+
+        Args:
+            events (list): StateEvents of lights, groups or scenes
+        """
+        for event in events:
+            kind = event.resource
+            # scene ids are strings, the others numbers
+            eid = event.eid if kind == "scenes" else int(event.eid)
+
+            delta = event.changes.get("name")
+            if delta is not None and delta.new is None:
+                self.remove(kind, eid)
+                continue
+
+            if delta is not None and delta.old is None:
+                if self._factory is not None and self.by_id(kind, eid) is None:
+                    entity = self._factory(kind, eid)
+                    if entity is not None:
+                        self.add(kind, entity)
+                continue
+
+            if delta is not None:
+                self.rename(kind, eid, delta.old, delta.new)
+
+            delta = event.changes.get("lights")
+            if kind == "lights" or delta is None or delta.new is None:
+                continue
+
+            self._relink(kind, eid, [int(lid) for lid in delta.new])
+
+    def all(self, kind: str) -> list:
+        """get all entities of a kind in registration order
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+
+        Returns:
+            list: registered entities
+        """
+        return self._entities[kind]
+
+    def by_id(self, kind: str, eid):
+        """find an entity by id
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            eid (int, str): id of the entity
+
+        Returns:
+            Light, Group, Scene: the entity or None
+        """
+        return self._by_id[kind].get(eid)
+
+    def by_name(self, kind: str, name: str):
+        """find an entity by name
+
+        Args:
+            kind (str): "lights", "groups" or "scenes"
+            name (str): name of the entity
+
+        Returns:
+            Light, Group, Scene: the first registered entity of that name or None
+        """
+        with self._lock:
+            named = self._by_name[kind].get(name)
+            return named[0] if named else None
+
+    def groups_of(self, lid: int) -> list:
+        """find the groups a light is a member of
+
+        Args:
+            lid (int): id of the light
+
+        Returns:
+            list: groups containing the light
+        """
+        return list(self._groups_of.get(lid, []))
+
+    def scenes_of(self, lid: int) -> list:
+        """find the scenes a light is part of
+
+        Args:
+            lid (int): id of the light
+
+        Returns:
+            list: scenes containing the light
+        """
+        return list(self._scenes_of.get(lid, []))
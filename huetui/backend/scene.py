@@ -26,6 +26,11 @@ class Scene(Util):
 
     @property
     def name(self) -> str:
+        # follow renames picked up by a refresh
+        document = self._bridge.state.peek("scenes", self._sid)
+        if document is not None:
+            self._name = document.get("name", self._name)
+
         return self._name
 
     @property
@@ -40,4 +45,4 @@ class Scene(Util):
         """
         addr = self._bridge._url + f"/groups/{group.gid}/action"
         payload = f"{{\"scene\": \"{self._sid}\"}}"
-        return self.api_put(addr, payload)
+        return self._bridge.api_put(addr, payload)
@@ -0,0 +1,445 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from enum import IntEnum
+from huetui.backend.client import Client, RateLimited
+from huetui.backend.metrics import endpoint_of
+from huetui.backend.trace import tracer
+import itertools
+import json
+import threading
+import time
+
+
+class Priority(IntEnum):
+    """
+    Enum for the priority classes of requests, lower is sent first.
+    """
+
+    INTERACTIVE_WRITE = 0
+    INTERACTIVE_READ = 1
+    BACKGROUND = 2
+
+
+class TokenBucket:
+    """Token bucket limiting how many commands are sent per second.
+
+    Args:
+        rate (float): tokens added per second
+        capacity (float): maximum number of tokens, i.e. the allowed burst
+
+    Attributes:
+        _rate (float): tokens added per second
+        _capacity (float): maximum number of tokens
+        _tokens (float): tokens currently available
+        _stamp (float): monotonic time of the last refill
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._stamp = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._stamp) * self._rate)
+        self._stamp = now
+
+    def delay(self) -> float:
+        """seconds until a token is available
+
+        Returns:
+            float: 0 if a token is available right away
+        """
+        self._refill()
+        return max(0.0, (1 - self._tokens) / self._rate)
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    def take(self) -> None:
+        """consume one token"""
+        self._refill()
+        self._tokens -= 1
+
+
+class Command:
+    """A queued request to one address of the bridge.
+
+    Args:
+        method (str): "GET", "PUT", "POST" or "DELETE"
+        address (str): address to send the request to
+        body (dict): values to put or post, None otherwise
+        lane (str): token bucket the command is paced by, None for reads
+        priority (Priority): priority class of the command
+        seq (int): submission order, breaks ties within a priority
+
+    Attributes:
+        created (float): monotonic time the command was queued at
+        attempts (int): times the command was sent
+        futures (list): futures of every caller merged into this command
+        keypresses (list): traced keypresses merged into this command
+    """
+
+    def __init__(
+        self,
+        method: str,
+        address: str,
+        body: dict,
+        lane: str,
+        priority: Priority,
+        seq: int,
+    ) -> None:
+        self.method = method
+        self.address = address
+        self.body = body
+        self.lane = lane
+        self.priority = priority
+        self.seq = seq
+        self.created = time.monotonic()
+        self.attempts = 0
+        self.futures = []
+        self.keypresses = []
+
+
+class CommandScheduler:
+    """Class scheduling all requests to a bridge.
+
+    The bridge handles about 10 light commands and 1 group command per
+    second. Writes are queued per address and sent by worker threads as
+    soon as their lane's token bucket allows it. A write to an address
+    that is still queued is merged into the queued command, so newer values
+    replace older ones and the bridge only sees the latest state.
+
+    Requests the bridge rejects as over its rate limit are queued again, so
+    sending them again waits for a token like any other command. Idempotent
+    requests are queued again as often as the client retries them.
+
+    Requests are sent by priority: interactive writes, then interactive
+    reads, then background refreshes. Background requests only go out while
+    no interactive request is queued and never occupy more than one worker,
+    so a keypress never waits behind a burst of polling.
+
+    Args:
+        client (Client): http client the commands are sent with
+        light_rate (float, optional): light commands per second. Defaults to 10.0.
+        group_rate (float, optional): group commands per second. Defaults to 1.0.
+        light_burst (float, optional): light commands sent without pacing. Defaults to 10.
+        group_burst (float, optional): group commands sent without pacing. Defaults to 1.
+        workers (int, optional): number of worker threads. Defaults to the client's pool size.
+
+    Attributes:
+        _client (Client): http client the commands are sent with
+        _buckets (dict): token bucket of each lane
+        _queue (OrderedDict): queued commands by method and address
+        _inflight (set): methods and addresses currently being sent
+        _background (int): background commands currently being sent
+        _local (local): per thread priority context
+        _cond (Condition): guards the queue and wakes the workers
+        _workers (list): worker threads, started on the first submit
+        _running (bool): whether the workers should keep running
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        light_rate: float = 10.0,
+        group_rate: float = 1.0,
+        light_burst: float = 10,
+        group_burst: float = 1,
+        workers: int = None,
+    ) -> None:
+        self._client = client
+        self._client.metrics.describe(
+            "huetui_queue_wait_seconds", "time commands waited in the queue"
+        )
+        self._buckets = {
+            "lights": TokenBucket(light_rate, light_burst),
+            "groups": TokenBucket(group_rate, group_burst),
+        }
+        self._queue = OrderedDict()
+        self._inflight = set()
+        self._background = 0
+        self._seq = itertools.count()
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._num_workers = workers if workers is not None else max(2, client.pool_size)
+        self._workers = []
+        self._running = True
+
+    @staticmethod
+    def lane_of(address: str, method: str = "PUT") -> str:
+        """find the lane a write is paced by
+
+        Only group actions count against the bridge's group command limit,
+        creating, renaming or deleting a group is paced like a light command.
+
+        Args:
+            address (str): address to write to
+            method (str, optional): "PUT", "POST" or "DELETE". Defaults to "PUT".
+
+        Returns:
+            str: "groups" for group actions, "lights" otherwise
+        """
+        if method == "PUT" and "/groups/" in address and address.endswith("/action"):
+            return "groups"
+        return "lights"
+
+    def interval(self, lane: str) -> float:
+        """seconds between two commands of a lane at its sustained rate
+
+        Args:
+            lane (str): "lights" or "groups"
+
+        Returns:
+            float: 1 / rate of the lane
+        """
+        return 1 / self._buckets[lane].rate
+
+    def burst(self, lane: str) -> float:
+        """commands of a lane that are sent without pacing
+
+        Args:
+            lane (str): "lights" or "groups"
+
+        Returns:
+            float: capacity of the lane's token bucket
+        """
+        return self._buckets[lane].capacity
+
+    @contextmanager
+    def background(self):
+        """Send all requests made by this thread inside the block as background work"""
+        previous = getattr(self._local, "background", False)
+        self._local.background = True
+        try:
+            yield
+        finally:
+            self._local.background = previous
+
+    def submit(
+        self, method: str, address: str, body: dict = None, priority: Priority = None
+    ) -> Future:
+        """queue a request, merging it into a queued request to the same address
+
+        Args:
+            method (str): "GET", "PUT", "POST" or "DELETE"
+            address (str): address to send the request to
+            body (dict, optional): values to put or post. Defaults to None.
+            priority (Priority, optional): priority class. Defaults to the thread's context.
+
+        Returns:
+            Future: resolves to the response once the bridge answered
+        """
+        if priority is None:
+            if getattr(self._local, "background", False):
+                priority = Priority.BACKGROUND
+            elif method == "GET":
+                priority = Priority.INTERACTIVE_READ
+            else:
+                priority = Priority.INTERACTIVE_WRITE
+
+        future = Future()
+
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("scheduler is closed")
+
+            # every post creates something, they are never merged
+            key = (method, address)
+            if method == "POST":
+                key += (next(self._seq),)
+            command = self._queue.get(key)
+            if command is None:
+                lane = self.lane_of(address, method) if method != "GET" else None
+                body = dict(body) if body is not None else None
+                command = Command(
+                    method, address, body, lane, priority, next(self._seq)
+                )
+                self._queue[key] = command
+            else:
+                # newer values replace the queued ones
+                if body is not None:
+                    command.body.update(body)
+                command.priority = min(command.priority, priority)
+
+            command.futures.append(future)
+            keypress = tracer.current()
+            if keypress is not None:
+                command.keypresses.append(keypress)
+                tracer.flow(keypress)
+            self._start_workers()
+            self._cond.notify()
+
+        return future
+
+    def _start_workers(self) -> None:
+        # needs to be called with self._cond held
+        while len(self._workers) < self._num_workers:
+            worker = threading.Thread(target=self._run, daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _next(self):
+        """pop the most urgent command that may be sent right now
+
+        Returns:
+            tuple: the command (or None) and the seconds to wait otherwise
+        """
+        wait = None
+        interactive = any(
+            command.priority < Priority.BACKGROUND for command in self._queue.values()
+        )
+
+        for key, command in sorted(
+            self._queue.items(), key=lambda item: (item[1].priority, item[1].seq)
+        ):
+            # keep writes to the same address in order, identical gets
+            # share the request in flight in the client instead
+            if (
+                command.method != "GET"
+                and (command.method, command.address) in self._inflight
+            ):
+                continue
+
+            # background work yields to interactive work
+            if command.priority == Priority.BACKGROUND and (
+                interactive or self._background > 0
+            ):
+                continue
+
+            if command.lane is not None:
+                bucket = self._buckets[command.lane]
+                delay = bucket.delay()
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                bucket.take()
+
+            del self._queue[key]
+            self._inflight.add((command.method, command.address))
+            if command.priority == Priority.BACKGROUND:
+                self._background += 1
+            return command, None
+
+        return None, wait
+
+    def _run(self) -> None:
+        """worker loop sending queued commands"""
+        while True:
+            with self._cond:
+                command, wait = self._next()
+                while command is None:
+                    if not self._running and not self._queue:
+                        return
+                    self._cond.wait(wait)
+                    command, wait = self._next()
+
+            dequeued = time.monotonic()
+            self._client.metrics.observe(
+                "huetui_queue_wait_seconds",
+                dequeued - command.created,
+                priority=command.priority.name.lower(),
+            )
+            tracer.complete(
+                "queue",
+                "queue",
+                command.created,
+                dequeued,
+                endpoint=endpoint_of(command.address),
+                keypresses=command.keypresses,
+            )
+
+            try:
+                with tracer.span(
+                    command.method,
+                    "http",
+                    endpoint=endpoint_of(command.address),
+                    keypresses=command.keypresses,
+                ):
+                    for keypress in command.keypresses:
+                        tracer.flow(keypress, end=True)
+
+                    if command.method == "GET":
+                        result = self._client.get(command.address)
+                    elif command.method == "POST":
+                        result = self._client.post(
+                            command.address, json.dumps(command.body)
+                        )
+                    elif command.method == "DELETE":
+                        result = self._client.delete(command.address)
+                    else:
+                        result = self._client.put(
+                            command.address, json.dumps(command.body)
+                        )
+
+                for future in command.futures:
+                    future.set_result(result)
+
+            except RateLimited as e:
+                if not self._requeue(command):
+                    for future in command.futures:
+                        future.set_exception(e)
+
+            except Exception as e:
+                for future in command.futures:
+                    future.set_exception(e)
+
+            finally:
+                with self._cond:
+                    self._inflight.discard((command.method, command.address))
+                    if command.priority == Priority.BACKGROUND:
+                        self._background -= 1
+                    self._cond.notify_all()
+
+    def _requeue(self, command: Command) -> bool:
+        """queue a command the bridge rejected as over its rate limit again
+
+        Values queued for the same address since it was sent replace its own.
+
+        Args:
+            command (Command): the rejected command
+
+        Returns:
+            bool: False if the command may not be sent again
+        """
+        command.attempts += 1
+        if (
+            command.method not in Client.IDEMPOTENT
+            or command.attempts > self._client.retries
+        ):
+            return False
+
+        self._client.metrics.inc(
+            "huetui_request_retries", endpoint=endpoint_of(command.address)
+        )
+
+        with self._cond:
+            key = (command.method, command.address)
+            queued = self._queue.get(key)
+            if queued is not None:
+                if queued.body is not None:
+                    command.body = {**(command.body or {}), **queued.body}
+                command.futures += queued.futures
+                command.keypresses += queued.keypresses
+                command.priority = min(command.priority, queued.priority)
+
+            self._queue[key] = command
+            self._cond.notify()
+
+        return True
+
+    def close(self) -> None:
+        """send the remaining queued commands and stop the workers"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+        for worker in self._workers:
+            worker.join()
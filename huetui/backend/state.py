@@ -0,0 +1,328 @@
+from typing import Callable
+from huetui.backend.events import EventBus, StateEvent, diff
+import threading
+import time
+
+
+class StateStore:
+    """Class holding the most recent state of the bridge's resources.
+
+    Every collection (e.g. "lights" or "groups") is fetched with a single
+    request and served from memory until it is older than the ttl. Every
+    load and local update is diffed against the cached state and the
+    changes are published on the event bus.
+
+    Writes are applied optimistically before the bridge acknowledged them
+    and are rolled back if it fails. Until then they are laid over every
+    freshly loaded payload. Acknowledged writes are laid over payloads
+    whose fetch started before the acknowledgement, so a poll racing the
+    write does not flicker the old state back either.
+
+    Args:
+        fetch (callable): fetches a collection by name, "" fetches the whole datastore
+        ttl (float, optional): seconds a collection is served before refetching. Defaults to 1.0.
+        bus (EventBus, optional): bus changes are published on. Defaults to a new bus.
+
+    Attributes:
+        _fetch (callable): fetches a collection by name
+        _ttl (float): seconds a collection is served before refetching
+        _data (dict): cached collections by name
+        _fetched (dict): monotonic time each collection was fetched at
+        _bus (EventBus): bus changes are published on
+        _optimistic (dict): unacknowledged values by resource, entity id and sub-document
+        _confirmed (dict): acknowledged values and the monotonic time they were
+            acknowledged at by resource, entity id and sub-document
+        _lock (RLock): guards _data, _fetched, _optimistic and _confirmed
+    """
+
+    def __init__(
+        self, fetch: Callable[[str], dict], ttl: float = 1.0, bus: EventBus = None
+    ) -> None:
+        self._fetch = fetch
+        self._ttl = ttl
+        self._bus = bus if bus is not None else EventBus()
+        self._data = {}
+        self._fetched = {}
+        self._optimistic = {}
+        self._confirmed = {}
+        self._lock = threading.RLock()
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, value: float) -> None:
+        self._ttl = value
+
+    @property
+    def bus(self) -> EventBus:
+        return self._bus
+
+    def load(self, resource: str, payload: dict, started: float = None) -> set:
+        """replace a collection with a freshly fetched payload
+
+        Args:
+            resource (str): name of the collection, e.g. "lights"
+            payload (dict): collection as returned by the api
+            started (float, optional): monotonic time the fetch was started at. Defaults to now.
+
+        Returns:
+            set: ids of the entities that changed since the last load
+        """
+        started = time.monotonic() if started is None else started
+
+        with self._lock:
+            # keep writes acknowledged after the fetch was sent, the payload
+            # predates them
+            for (confirmed_resource, eid, key), values in list(
+                self._confirmed.items()
+            ):
+                if confirmed_resource != resource:
+                    continue
+
+                newer = {
+                    param: value
+                    for param, (value, confirmed) in values.items()
+                    if confirmed > started
+                }
+                if key in payload.get(eid, {}):
+                    payload[eid][key].update(newer)
+
+                if newer:
+                    self._confirmed[(resource, eid, key)] = {
+                        param: values[param] for param in newer
+                    }
+                else:
+                    del self._confirmed[(resource, eid, key)]
+
+            # keep writes the bridge has not acknowledged yet
+            for (pending_resource, eid, key), values in self._optimistic.items():
+                if pending_resource == resource and key in payload.get(eid, {}):
+                    payload[eid][key].update(values)
+
+            previous = self._data.get(resource, {})
+            self._data[resource] = payload
+            self._fetched[resource] = time.monotonic()
+
+        # diff against the previous snapshot
+        events = []
+        for eid in previous.keys() | payload.keys():
+            if previous.get(eid) != payload.get(eid):
+                changes = diff(previous.get(eid) or {}, payload.get(eid) or {})
+                events.append(StateEvent(resource, eid, changes))
+
+        self._bus.publish(events)
+
+        return {event.eid for event in events}
+
+    def refresh(self, resource: str) -> set:
+        """refetch a collection regardless of its age
+
+        Args:
+            resource (str): name of the collection
+
+        Returns:
+            set: ids of the entities that changed since the last load
+        """
+        started = time.monotonic()
+        return self.load(resource, self._fetch(resource), started)
+
+    def snapshot(self) -> dict:
+        """fetch the whole datastore with one request and load lights, groups and scenes
+
+        Returns:
+            dict: ids of the changed entities by collection
+        """
+        started = time.monotonic()
+        payload = self._fetch("")
+        changes = {}
+
+        for resource in ("lights", "groups", "scenes"):
+            if resource in payload:
+                changes[resource] = self.load(resource, payload[resource], started)
+
+        return changes
+
+    def is_stale(self, resource: str) -> bool:
+        """check if a collection needs to be refetched
+
+        Args:
+            resource (str): name of the collection
+
+        Returns:
+            bool: True if missing or older than the ttl
+        """
+        with self._lock:
+            fetched = self._fetched.get(resource)
+
+        return fetched is None or time.monotonic() - fetched > self._ttl
+
+    def collection(self, resource: str) -> dict:
+        """get a collection, refetching it if stale
+
+        Args:
+            resource (str): name of the collection
+
+        Returns:
+            dict: collection by entity id
+        """
+        if self.is_stale(resource):
+            started = time.monotonic()
+            self.load(resource, self._fetch(resource), started)
+
+        with self._lock:
+            return self._data[resource]
+
+    def entity(self, resource: str, eid) -> dict:
+        """get one entity of a collection
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+
+        Returns:
+            dict: entity as returned by the api
+        """
+        return self.collection(resource)[str(eid)]
+
+    def peek(self, resource: str, eid) -> dict:
+        """get one entity of a collection without refetching it
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+
+        Returns:
+            dict: cached entity or None if it was never fetched
+        """
+        with self._lock:
+            return self._data.get(resource, {}).get(str(eid))
+
+    def _patch(self, resource: str, eid, key: str, changes: dict) -> tuple:
+        # needs to be called with self._lock held
+        try:
+            document = self._data[resource][str(eid)][key]
+        except KeyError:
+            return {}, {}
+
+        previous = {param: document.get(param) for param in changes}
+        deltas = diff(document, {**document, **changes}, key + ".")
+        document.update(changes)
+
+        return previous, deltas
+
+    def _acknowledge(self, resource: str, eid, key: str, changes: dict) -> None:
+        # needs to be called with self._lock held
+        now = time.monotonic()
+        self._confirmed.setdefault((resource, str(eid), key), {}).update(
+            {param: (value, now) for param, value in changes.items()}
+        )
+
+    def _publish(self, resource: str, eid, deltas: dict) -> None:
+        if deltas:
+            self._bus.publish([StateEvent(resource, str(eid), deltas)])
+
+    def update(self, resource: str, eid, key: str, changes: dict) -> None:
+        """patch a cached entity after a successful write
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+            key (str): sub-document to patch, e.g. "state" or "action"
+            changes (dict): values written to the bridge
+        """
+        with self._lock:
+            _, deltas = self._patch(resource, eid, key, changes)
+            self._acknowledge(resource, eid, key, changes)
+
+        self._publish(resource, eid, deltas)
+
+    def apply(self, resource: str, eid, key: str, changes: dict) -> dict:
+        """patch a cached entity before the write was acknowledged
+
+        Must be followed by confirm() or revert() once the bridge answered.
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+            key (str): sub-document to patch, e.g. "state" or "action"
+            changes (dict): values being written to the bridge
+
+        Returns:
+            dict: previous values of the patched parameters
+        """
+        with self._lock:
+            previous, deltas = self._patch(resource, eid, key, changes)
+            self._optimistic.setdefault((resource, str(eid), key), {}).update(changes)
+
+        self._publish(resource, eid, deltas)
+
+        return previous
+
+    def _settle(self, resource: str, eid, key: str, changes: dict) -> None:
+        # needs to be called with self._lock held
+        pending = self._optimistic.get((resource, str(eid), key), {})
+        for param, value in changes.items():
+            # a newer write to the same parameter is still in flight
+            if param in pending and pending[param] == value:
+                del pending[param]
+
+        if not pending:
+            self._optimistic.pop((resource, str(eid), key), None)
+
+    def confirm(self, resource: str, eid, key: str, changes: dict) -> None:
+        """mark an optimistic write as acknowledged by the bridge
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+            key (str): sub-document that was patched
+            changes (dict): values passed to apply()
+        """
+        with self._lock:
+            self._settle(resource, eid, key, changes)
+            self._acknowledge(resource, eid, key, changes)
+
+    def revert(
+        self, resource: str, eid, key: str, changes: dict, previous: dict
+    ) -> None:
+        """roll back an optimistic write the bridge rejected
+
+        Parameters changed again since apply() are left alone.
+
+        Args:
+            resource (str): name of the collection
+            eid (int, str): id of the entity
+            key (str): sub-document that was patched
+            changes (dict): values passed to apply()
+            previous (dict): values returned by apply()
+        """
+        with self._lock:
+            self._settle(resource, eid, key, changes)
+
+            try:
+                document = self._data[resource][str(eid)][key]
+            except KeyError:
+                return
+
+            restore = {
+                param: previous[param]
+                for param, value in changes.items()
+                if param in previous and document.get(param) == value
+            }
+            _, deltas = self._patch(resource, eid, key, restore)
+
+        self._publish(resource, eid, deltas)
+
+    def invalidate(self, resource: str = None) -> None:
+        """mark one or all collections as stale
+
+        Args:
+            resource (str, optional): name of the collection. Defaults to all.
+        """
+        with self._lock:
+            if resource is None:
+                self._fetched.clear()
+            else:
+                self._fetched.pop(resource, None)
@@ -0,0 +1,218 @@
+from contextlib import contextmanager
+from functools import wraps
+from os import path, makedirs
+import itertools
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    """Records span timings as Chrome trace events.
+
+    Tracing is off until enable() is called, spans are free otherwise.
+    Every keypress gets an id that is carried to the spans it causes on
+    other threads (the command executor and the queue wait and HTTP
+    request of the scheduler), so a
+    single keypress can be followed from its handler to the redraw of the
+    active panel. The result can be opened in chrome://tracing or Perfetto.
+
+    Attributes:
+        enabled (bool): whether spans are recorded
+        _events (list): recorded trace events
+        _threads (set): thread ids that got a name event
+        _keypresses (count): source of keypress ids
+        _local (local): keypress id of the current thread
+        _lock (Lock): guards the events
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._events = []
+        self._threads = set()
+        self._keypresses = itertools.count(1)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        """start recording spans"""
+        self.enabled = True
+
+    def current(self) -> int:
+        """id of the keypress handled by the current thread
+
+        Returns:
+            int: keypress id or None
+        """
+        return getattr(self._local, "keypress", None)
+
+    def _emit(self, event: dict) -> None:
+        tid = threading.get_ident()
+        event["pid"] = os.getpid()
+        event["tid"] = tid
+
+        with self._lock:
+            if tid not in self._threads:
+                self._threads.add(tid)
+                self._events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": event["pid"],
+                        "tid": tid,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self._events.append(event)
+
+    @staticmethod
+    def _us(timestamp: float) -> float:
+        return timestamp * 1e6
+
+    def complete(self, name: str, cat: str, start: float, end: float, **args) -> None:
+        """record a span that already ended
+
+        Args:
+            name (str): span name
+            cat (str): category, e.g. "handler", "queue", "http" or "render"
+            start (float): time.monotonic() at the start
+            end (float): time.monotonic() at the end
+            **args: shown with the span
+        """
+        if not self.enabled:
+            return
+
+        keypress = self.current()
+        if keypress is not None:
+            args.setdefault("keypress", keypress)
+
+        self._emit(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": self._us(start),
+                "dur": self._us(end - start),
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        """record the time spent in the with block
+
+        Args:
+            name (str): span name
+            cat (str): category
+            **args: shown with the span
+        """
+        if not self.enabled:
+            yield
+            return
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, start, time.monotonic(), **args)
+
+    @contextmanager
+    def keypress(self, name: str):
+        """handle a keypress, spans on this thread are attributed to it
+
+        Args:
+            name (str): name of the key handler
+        """
+        if not self.enabled:
+            yield
+            return
+
+        previous = self.current()
+        self._local.keypress = next(self._keypresses)
+        try:
+            with self.span(name, "handler"):
+                yield
+        finally:
+            self._local.keypress = previous
+
+    @contextmanager
+    def resume(self, keypress: int, name: str):
+        """continue a keypress on another thread
+
+        Args:
+            keypress (int): keypress id from current() or None
+            name (str): span name of the work done for the keypress
+        """
+        if not self.enabled:
+            yield
+            return
+
+        previous = self.current()
+        self._local.keypress = keypress
+        try:
+            with self.span(name, "command"):
+                self.flow(keypress, end=True)
+                yield
+        finally:
+            self._local.keypress = previous
+
+    def flow(self, keypress: int, end: bool = False) -> None:
+        """connect the spans of a keypress across threads
+
+        Args:
+            keypress (int): keypress id
+            end (bool, optional): end the arrow in the current span. Defaults to False.
+        """
+        if not self.enabled or keypress is None:
+            return
+
+        event = {
+            "name": "keypress",
+            "cat": "flow",
+            "ph": "f" if end else "s",
+            "id": keypress,
+            "ts": self._us(time.monotonic()),
+        }
+        if end:
+            event["bp"] = "e"
+        self._emit(event)
+
+    def to_chrome(self) -> dict:
+        """export the recorded spans
+
+        Returns:
+            dict: Chrome trace-event JSON object
+        """
+        with self._lock:
+            events = list(self._events)
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write(self, file: str) -> None:
+        """write the recorded spans to a trace file
+
+        Args:
+            file (str): path of the file
+        """
+        file = path.expanduser(file)
+        if path.dirname(file) and not path.exists(path.dirname(file)):
+            makedirs(path.dirname(file))
+
+        with open(file, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+
+
+# process wide tracer, enabled by huetui --trace
+tracer = Tracer()
+
+
+def traced(func):
+    """decorator tracing a key handler as a keypress"""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.keypress(func.__qualname__):
+            return func(*args, **kwargs)
+
+    return wrapper
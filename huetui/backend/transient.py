@@ -0,0 +1,222 @@
+from collections import OrderedDict
+from huetui.backend.group import Group
+import huetui.backend.bridge as Bridge
+import threading
+import uuid
+
+
+# groups a v1 bridge can hold
+MAX_GROUPS = 64
+
+
+class TransientGroups:
+    """Temporary bridge groups for ad-hoc sets of lights.
+
+    Setting the same state on a set of lights that is not an existing group
+    takes one request per light. Instead a group holding exactly these
+    lights is created on the bridge and reused for later changes of the same
+    set, so every change is a single group action that all lights apply at
+    once. The least recently used groups are deleted to stay below the
+    bridge's group limit, the remaining ones are deleted by clear().
+
+    Group actions are limited to about one per second though, so small sets
+    are better off with one light command each, see Bridge.set_lights.
+    Groups that could not be deleted, were created by a request that timed
+    out or were left over by a previous session are deleted by sweep().
+
+    Args:
+        bridge (Bridge): bridge to create the groups on
+        capacity (int, optional): transient groups kept at most. Defaults to 16.
+
+    Attributes:
+        _bridge (Bridge): bridge to create the groups on
+        _capacity (int): transient groups kept at most
+        _groups (OrderedDict): groups by light ids, least recently used first
+        _creating (set): names of the groups being created
+        _dirty (bool): whether the bridge may hold groups that are not tracked
+        _lock (Lock): guards the groups, never held across requests
+    """
+
+    PREFIX = "huetui-"
+
+    def __init__(self, bridge: Bridge, capacity: int = 16) -> None:
+        self._bridge = bridge
+        self._capacity = capacity
+        self._groups = OrderedDict()
+        self._creating = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+        bridge.metrics.describe(
+            "huetui_transient_group_failures",
+            "sets of lights that fell back to one write per light",
+        )
+
+    @property
+    def groups(self) -> list:
+        with self._lock:
+            return list(self._groups.values())
+
+    def _own(self) -> set:
+        """ids of the tracked groups"""
+        with self._lock:
+            return {str(group.gid) for group in self._groups.values()}
+
+    def _room(self) -> int:
+        """number of transient groups the bridge has room for"""
+        own = self._own()
+        others = [
+            gid for gid in self._bridge.state.collection("groups") if gid not in own
+        ]
+
+        return min(self._capacity, MAX_GROUPS - len(others))
+
+    def _create(self, lights: list) -> Group:
+        """create a group of the lights on the bridge"""
+        name = self.PREFIX + uuid.uuid4().hex[:8]
+
+        # keep sweep() from deleting it before it is tracked
+        with self._lock:
+            self._creating.add(name)
+
+        try:
+            response = self._bridge.api_post(
+                self._bridge.url + "/groups",
+                {
+                    "name": name,
+                    "type": "LightGroup",
+                    "lights": [str(light.lid) for light in lights],
+                },
+            )
+            return Group(self._bridge, int(response[0]["success"]["id"]), name, lights)
+
+        except Exception:
+            # the bridge may have created it before the request failed
+            self._dirty = True
+            raise
+
+        finally:
+            with self._lock:
+                self._creating.discard(name)
+
+    def _delete(self, gid: int) -> None:
+        """delete a group from the bridge"""
+        self._bridge.api_delete(self._bridge.url + f"/groups/{gid}")
+
+    def sweep(self, groups: dict = None) -> None:
+        """delete transient groups on the bridge that are not in use
+
+        Args:
+            groups (dict, optional): the /groups payload. Defaults to refetching it.
+        """
+        if groups is None:
+            self._bridge.state.refresh("groups")
+            groups = self._bridge.state.collection("groups")
+
+        own = self._own()
+        with self._lock:
+            creating = set(self._creating)
+
+        for gid, group in list(groups.items()):
+            name = group.get("name", "")
+            if gid in own or name in creating or not name.startswith(self.PREFIX):
+                continue
+
+            try:
+                self._delete(int(gid))
+            except Exception as e:
+                self._dirty = True
+                self._bridge.metrics.error(e)
+
+    def get(self, lights: list) -> Group:
+        """get a group holding exactly the lights, creating it if needed
+
+        Args:
+            lights (list): lights of the group
+
+        Returns:
+            Group: transient group or None if the bridge has no room for it
+        """
+        key = frozenset(light.lid for light in lights)
+
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None:
+                self._groups.move_to_end(key)
+                return group
+
+            dirty, self._dirty = self._dirty, False
+
+        # clean up after earlier failures before making room
+        if dirty:
+            self.sweep()
+
+        room = self._room()
+        if room <= 0:
+            return None
+
+        # evict the least recently used groups
+        with self._lock:
+            evicted = []
+            while self._groups and len(self._groups) >= room:
+                evicted.append(self._groups.popitem(last=False)[1])
+
+        for group in evicted:
+            try:
+                self._delete(group.gid)
+            except Exception:
+                self._dirty = True
+                raise
+
+        group = self._create(lights)
+
+        with self._lock:
+            # another thread may have created one for the same lights meanwhile
+            spare = self._groups.get(key)
+            if spare is None:
+                self._groups[key] = group
+            else:
+                self._groups.move_to_end(key)
+                group, spare = spare, group
+
+        if spare is not None:
+            try:
+                self._delete(spare.gid)
+            except Exception:
+                self._dirty = True
+
+        return group
+
+    def set_lights(
+        self, lights: list, changes: dict, transitiontime: int = None
+    ) -> None:
+        """set the same state on the lights with one group action
+
+        Falls back to one request per light if no group could be created.
+
+        Args:
+            lights (list): lights to update
+            changes (dict): v1 state values, e.g. {"on": True, "bri": 254}
+            transitiontime (int, optional): fade duration in 100ms. Defaults to the bridge's 400ms.
+        """
+        try:
+            group = self.get(lights)
+        except Exception as e:
+            self._bridge.metrics.inc("huetui_transient_group_failures")
+            self._bridge.metrics.error(e)
+            group = None
+
+        if group is not None:
+            group.set_action(changes, transitiontime)
+        else:
+            self._bridge.set_lights_individually(lights, changes, transitiontime)
+
+    def clear(self) -> None:
+        """delete all transient groups from the bridge"""
+        with self._lock:
+            groups, self._groups = list(self._groups.values()), OrderedDict()
+
+        for group in groups:
+            try:
+                self._delete(group.gid)
+            except Exception as e:
+                self._bridge.metrics.error(e)
@@ -1,11 +1,12 @@
 from dataclasses import dataclass, field
-from click import MissingParameter
-import urllib3
+from huetui.backend.client import Client
 from os import path
 from sys import path as syspath
 from sys import exit as sysexit
 from os import makedirs 
-import json
+
+_default_client: Client = None
+
 
 @dataclass
 class Config:
@@ -16,6 +17,16 @@ class Config:
     tui_settings: dict = field(default_factory=dict)
     ip: str = ""
     api_user: str = ""
+    bridges: list = field(default_factory=list)
+    http_settings: dict = field(default_factory=dict)
+    scheduler_settings: dict = field(default_factory=dict)
+    poll_settings: dict = field(default_factory=dict)
+    eventstream: bool = False
+    eventstream_settings: dict = field(default_factory=dict)
+    metrics_settings: dict = field(default_factory=dict)
+    write_filter_settings: dict = field(default_factory=dict)
+    state_ttl: float = 1.0
+    startup_timeout: float = 10.0
 
 
 class Util:
@@ -59,28 +70,7 @@ class Util:
         Returns:
             dict: response from api.
         """
-        if address:
-            # try to create a connection
-            http = urllib3.PoolManager()
-            response = http.request("GET", address)
-
-            # check if response ok
-            if (response.status == 200) and not (
-                response.data.decode("utf-8").startswith('[{"error":')
-            ):
-                payload = json.loads(response.data.decode("utf-8"))
-                return dict(payload)
-
-            else:
-                raise Exception(
-                    "Code: "
-                    + str(response.status)
-                    + "; API error: "
-                    + response.data.decode("utf-8")
-                )
-
-        else:
-            raise MissingParameter("adress")
+        return Util._Util__default_client().get(address)
 
     @staticmethod
     def api_put(address: str, data: str) -> bool:
@@ -93,26 +83,15 @@ class Util:
         Returns:
             bool: post successfull.
         """
-        if address and data:
-            http = urllib3.PoolManager()
-            response = http.request(
-                "PUT", address, body=data, headers={"Content-Type": "application/json"}
-            )
-
-            if (response.status == 200) and (
-                response.data.decode("utf-8").startswith('[{"success":')
-            ):
-                return True
-            else:
-                raise Exception(
-                    "Code: "
-                    + str(response.status)
-                    + "; API error: "
-                    + response.data.decode("utf-8")
-                )
+        return Util._Util__default_client().put(address, data)
 
-        else:
-            raise MissingParameter("adress or data")
+    @staticmethod
+    def __default_client() -> Client:
+        # lazily create one pool shared by all callers outside of a bridge
+        global _default_client
+        if _default_client is None:
+            _default_client = Client()
+        return _default_client
 
     @staticmethod
     def __ensure_dir(paf: str) -> bool:
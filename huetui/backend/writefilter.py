@@ -0,0 +1,84 @@
+class WriteFilter:
+    """Drops the fields of a write that would not change a light.
+
+    Every field is compared against the light's known state. Fields whose
+    value the light already has are dropped, and a write left without
+    fields is not sent at all. Hue, saturation and brightness can be given
+    a tolerance below which differences are not visible anyway.
+
+    Args:
+        enabled (bool, optional): whether writes are filtered. Defaults to True.
+        tolerance (dict, optional): allowed difference by parameter in api units,
+            e.g. {"bri": 2, "sat": 2, "hue": 200}. Defaults to exact matches.
+
+    Attributes:
+        enabled (bool): whether writes are filtered
+        tolerance (dict): allowed difference by parameter in api units
+    """
+
+    # fields only describing how a change is made
+    MODIFIERS = ("transitiontime",)
+
+    # hue wraps around at this value
+    HUE_RANGE = 65536
+
+    def __init__(self, enabled: bool = True, tolerance: dict = None) -> None:
+        self.enabled = enabled
+        self.tolerance = tolerance if tolerance is not None else {}
+
+    def is_noop(self, param: str, current, value) -> bool:
+        """check if writing a value would not change the light
+
+        Args:
+            param (str): v1 state parameter, e.g. "bri"
+            current: the light's known value, None if unknown
+            value: value to write
+
+        Returns:
+            bool: True if the value can be dropped
+        """
+        if current is None:
+            return False
+
+        tolerance = self.tolerance.get(param)
+        if tolerance is None or isinstance(value, bool) or not isinstance(
+            value, (int, float)
+        ):
+            return current == value
+
+        difference = abs(current - value)
+        if param == "hue":
+            difference = min(difference, self.HUE_RANGE - difference)
+
+        return difference <= tolerance
+
+    def trim(self, documents: list, changes: dict) -> dict:
+        """drop the fields every light already has
+
+        Args:
+            documents (list): known state of every light the write applies to,
+                None for lights whose state is unknown
+            changes (dict): v1 state values to write
+
+        Returns:
+            dict: the fields that need to be sent, empty if none
+        """
+        if not self.enabled or not documents or None in documents:
+            return changes
+
+        trimmed = {
+            param: value
+            for param, value in changes.items()
+            if param not in self.MODIFIERS
+            and not all(
+                self.is_noop(param, document.get(param), value)
+                for document in documents
+            )
+        }
+
+        if trimmed:
+            for param in self.MODIFIERS:
+                if param in changes:
+                    trimmed[param] = changes[param]
+
+        return trimmed
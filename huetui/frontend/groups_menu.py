@@ -3,7 +3,9 @@ import py_cui.grid as Grid
 import py_cui.widgets as Widgets
 
 from py_cui.debug import PyCUILogger as Logger
-from huetui.backend.bridge import Bridge
+from huetui.backend.bridgeset import BridgeSet
+from huetui.backend.trace import traced
+from huetui.backend.group import Group
 from huetui.backend.light import RGB
 from huetui.frontend.utils import get_xrdb_colors
 
@@ -21,7 +23,7 @@ class GroupMenu(Widgets.ScrollMenu):
         padx (int): x padding
         pady (int): y padding
         logger (Logger): logger object
-        bridge (Bridge): bridge object
+        bridge (BridgeSet): bridges to control
     """
 
     def __init__(
@@ -36,7 +38,7 @@ class GroupMenu(Widgets.ScrollMenu):
         padx: int,
         pady: int,
         logger: Logger,
-        bridge: Bridge,
+        bridge: BridgeSet,
         master,
     ) -> None:
         # set fallback colors in case xrdb is not available
@@ -64,6 +66,7 @@ class GroupMenu(Widgets.ScrollMenu):
             self.colors = xrdb_colors
 
         self.master = master
+        self.bridge = bridge
         self.groups = bridge.groups
         super(GroupMenu, self).__init__(
             id, title, grid, row, column, row_span, column_span, padx, pady, logger
@@ -74,30 +77,53 @@ class GroupMenu(Widgets.ScrollMenu):
             " c to set color, Enter to toggle,"
             " ESC to exit"
         )
-        self.add_item_list([group.name for group in self.groups])
+        self.add_item_list([bridge.name_of(group) for group in self.groups])
         self.add_key_command(Keys.KEY_ENTER, self.toggle)
         self.add_key_command(Keys.KEY_K_LOWER, command=self.inc_bri)
         self.add_key_command(Keys.KEY_J_LOWER, command=self.dec_bri)
         self.add_key_command(Keys.KEY_C_LOWER, self.popup)
 
+    @traced
     def toggle(self) -> None:
         """Toggle group on/off."""
-        self.groups[self.get_selected_item_index()].all_on = not self.groups[
-            self.get_selected_item_index()
-        ].all_on
+        group = self.groups[self.get_selected_item_index()]
+        self.master.run_command(
+            f"Toggle {group.name}",
+            self.toggle_all_on,
+            group,
+            key=self.bridge.topic_of(group),
+        )
+
+    @staticmethod
+    def toggle_all_on(group) -> None:
+        """toggle a group on or off, runs on the command executor
+
+        Args:
+            group (Group): group to toggle
+        """
+        group.all_on = not group.all_on
 
+    @traced
     def inc_bri(self) -> None:
         """Increase brightness of group."""
-        self.groups[self.get_selected_item_index()].brightness += 10
+        group = self.groups[self.get_selected_item_index()]
+        self.master.run_adjustment(
+            f"Brightness {group.name}", Group.step_brightness, group, 10, "groups"
+        )
 
+    @traced
     def dec_bri(self) -> None:
         """Decrease brightness of group."""
-        self.groups[self.get_selected_item_index()].brightness -= 10
+        group = self.groups[self.get_selected_item_index()]
+        self.master.run_adjustment(
+            f"Brightness {group.name}", Group.step_brightness, group, -10, "groups"
+        )
 
     def popup(self) -> None:
         """Show color picker popup."""
         self.master.show_menu_popup("Color", self.colors.keys(), self.set_picked_color)
 
+    @traced
     def set_picked_color(self, color: str) -> None:
         """set picked color by converting it to rgb.
 
@@ -107,6 +133,10 @@ class GroupMenu(Widgets.ScrollMenu):
         selCol = self.colors[color].strip("#")
         rgbTup = tuple(int(selCol[i : i + 2], 16) for i in (0, 2, 4))
         rgbCol = RGB(rgbTup[0], rgbTup[1], rgbTup[2])
-        self.groups[self.get_selected_item_index()].on = True
-        for light in self.groups[self.get_selected_item_index()].lights:
-            light.color = rgbCol
+        group = self.groups[self.get_selected_item_index()]
+        self.master.run_command(
+            f"Color {group.name}",
+            group.set_color,
+            rgbCol,
+            key=self.bridge.topic_of(group),
+        )
@@ -3,8 +3,9 @@ import py_cui.grid as Grid
 import py_cui.widgets as Widgets
 
 from py_cui.debug import PyCUILogger as Logger
-from huetui.backend.bridge import Bridge
-from huetui.backend.light import RGB
+from huetui.backend.bridgeset import BridgeSet
+from huetui.backend.trace import traced
+from huetui.backend.light import Light, RGB
 from huetui.frontend.utils import get_xrdb_colors
 
 
@@ -21,7 +22,7 @@ class LightMenu(Widgets.ScrollMenu):
         padx (int): x padding
         pady (int): y padding
         logger (Logger): logger object
-        bridge (Bridge): bridge object
+        bridge (BridgeSet): bridges to control
     """
 
     def __init__(
@@ -36,9 +37,10 @@ class LightMenu(Widgets.ScrollMenu):
         padx: int,
         pady: int,
         logger: Logger,
-        bridge: Bridge,
+        bridge: BridgeSet,
         master,
     ) -> None:
+        self.bridge = bridge
         self.lights = bridge.lights
         self.master = master
         # set fallback colors in case xrdb is not available
@@ -74,28 +76,43 @@ class LightMenu(Widgets.ScrollMenu):
             " c to set color, Enter to toggle,"
             " ESC to exit"
         )
-        self.add_item_list([light.name for light in self.lights])
+        self.add_item_list([bridge.name_of(light) for light in self.lights])
         self.add_key_command(Keys.KEY_ENTER, self.toggle)
         self.add_key_command(Keys.KEY_K_LOWER, command=self.inc_bri)
         self.add_key_command(Keys.KEY_J_LOWER, command=self.dec_bri)
         self.add_key_command(Keys.KEY_C_LOWER, self.popup)
 
+    @traced
     def toggle(self) -> None:
         """Toggle light."""
-        self.lights[self.get_selected_item_index()].toggle()
+        light = self.lights[self.get_selected_item_index()]
+        self.master.run_command(
+            f"Toggle {self.get()}",
+            light.toggle,
+            key=self.bridge.topic_of(light),
+        )
 
+    @traced
     def inc_bri(self) -> None:
         """Increase brightness."""
-        self.lights[self.get_selected_item_index()].brightness += 10
+        light = self.lights[self.get_selected_item_index()]
+        self.master.run_adjustment(
+            f"Brightness {self.get()}", Light.step_brightness, light, 10, "lights"
+        )
 
+    @traced
     def dec_bri(self) -> None:
         """Increase brightness."""
-        self.lights[self.get_selected_item_index()].brightness -= 10
+        light = self.lights[self.get_selected_item_index()]
+        self.master.run_adjustment(
+            f"Brightness {self.get()}", Light.step_brightness, light, -10, "lights"
+        )
 
     def popup(self) -> None:
         """Show color picker popup."""
         self.master.show_menu_popup("Color", self.colors.keys(), self.set_picked_color)
 
+    @traced
     def set_picked_color(self, color: str) -> None:
         """set picked color by converting it to rgb.
 
@@ -105,5 +122,23 @@ class LightMenu(Widgets.ScrollMenu):
         selCol = self.colors[color].strip("#")
         rgbTup = tuple(int(selCol[i : i + 2], 16) for i in (0, 2, 4))
         rgbCol = RGB(rgbTup[0], rgbTup[1], rgbTup[2])
-        self.lights[self.get_selected_item_index()].on = True
-        self.lights[self.get_selected_item_index()].color = rgbCol
+        light = self.lights[self.get_selected_item_index()]
+        self.master.run_command(
+            f"Color {self.get()}",
+            self.apply_color,
+            light,
+            rgbCol,
+            key=self.bridge.topic_of(light),
+        )
+
+    @staticmethod
+    def apply_color(light, rgb: RGB) -> None:
+        """switch a light on and set its color, runs on the command executor
+
+        Args:
+            light (Light): light to change
+            rgb (RGB): color to set
+        """
+        with light.batch():
+            light.on = True
+            light.color = rgb
@@ -1,14 +1,20 @@
 import py_cui as cui
 from py_cui import keys as Keys
 
-from huetui.backend.bridge import Bridge
+from huetui.backend.bridgeset import BridgeSet
+from huetui.backend.light import Parameter
 from huetui.backend.utils import Config
+from huetui.backend.poller import StatePoller
+from huetui.backend.eventstream import EventStream
+from huetui.backend.executor import CommandExecutor
+from huetui.backend.accumulator import Accumulator
+from huetui.backend.trace import tracer
 
 from huetui.frontend.lights_menu import LightMenu
 from huetui.frontend.groups_menu import GroupMenu
 from huetui.frontend.scenes_menu import SceneMenu
 
-import time, threading
+import threading
 
 
 class extPyCUI(cui.PyCUI):
@@ -17,13 +23,99 @@ class extPyCUI(cui.PyCUI):
     Args:
         x (int): width of the window
         y (int): height of the window
-        bridge (Bridge): bridge object
+        bridge (BridgeSet): bridges to control
+
+    Attributes:
+        executor (CommandExecutor): runs the bridge commands of the menus
+        accumulator (Accumulator): sums up repeated adjustments of the menus
+        syncs (list): state pollers or event streams keeping the bridges' state fresh
+        _failures (float): failed light writes already shown
+        _degraded (bool): whether the title shows a bridge as degraded
     """
 
-    def __init__(self, x: int, y: int, bridge: Bridge) -> None:
+    DEGRADED = " - bridge degraded"
+
+    def __init__(self, x: int, y: int, bridge: BridgeSet) -> None:
         self.bridge = bridge
+        self.executor = CommandExecutor()
+        self.accumulator = Accumulator()
+        self.syncs = []
+        self._failures = 0
+        self._degraded = False
         super(extPyCUI, self).__init__(x, y)
 
+    def run_command(self, description: str, func, *args, key: str = None) -> None:
+        """run a bridge command without blocking the input loop
+
+        Args:
+            description (str): shown in the status bar once the command finished
+            func (callable): the command
+            *args: passed on to func
+            key (str, optional): commands with the same key run in order. Defaults to None.
+        """
+        self.executor.submit(description, func, *args, key=key)
+
+    def run_adjustment(
+        self, description: str, func, target, step: int, lane: str
+    ) -> None:
+        """sum up repeated steps and run them once per rate limit window
+
+        The steps are applied as func(target, steps, transitiontime) on the
+        command executor, fading over the window so holding a key feels smooth.
+
+        Args:
+            description (str): shown in the status bar once the command finished
+            func (callable): applies the summed up steps to the target
+            target (Light, Group): light or group to adjust
+            step (int): amount to adjust by
+            lane (str): "lights" or "groups", the rate limit the target is paced by
+        """
+        bridge = self.bridge.bridge_of(target)
+        # the target was removed from its bridge meanwhile
+        if bridge is None:
+            return
+
+        window = bridge.scheduler.interval(lane)
+        transitiontime = round(window * 10)
+        key = self.bridge.topic_of(target)
+
+        self.accumulator.add(
+            key,
+            step,
+            lambda steps: self.run_command(
+                description, func, target, steps, transitiontime, key=key
+            ),
+            window,
+        )
+
+    def post_results(self) -> None:
+        """show the results of the finished commands and the bridge's health, called on every redraw"""
+        for result in self.executor.drain():
+            if result.error is not None:
+                self.show_error_popup(
+                    "Bridge error", f"{result.description}: {result.error}"
+                )
+            elif result.value is False:
+                self.status_bar.set_text(f"{result.description}: failed")
+            else:
+                self.status_bar.set_text(f"{result.description}: done")
+
+        # light writes report their failures to the metrics instead of raising
+        failures = self.bridge.metrics.counter("huetui_command_failures")
+        if failures > self._failures:
+            self._failures = failures
+            self.show_error_popup("Bridge error", self.bridge.metrics.last_error)
+
+        # mark the title while requests fail fast or the state can't be
+        # synced, until the bridge recovers
+        degraded = self.bridge.degraded or any(sync.degraded for sync in self.syncs)
+        if degraded != self._degraded:
+            self._degraded = degraded
+            if degraded:
+                self.set_title(self._title + self.DEGRADED)
+            else:
+                self.set_title(self._title[: -len(self.DEGRADED)])
+
     def add_light_menu(
         self,
         title: str,
@@ -154,10 +246,11 @@ class extPyCUI(cui.PyCUI):
 class MainWindow:
     """Main HueTUI window class."""
 
-    def __init__(self, master: extPyCUI, bridge: Bridge, config: Config) -> None:
+    def __init__(self, master: extPyCUI, bridge: BridgeSet, config: Config) -> None:
         self.master = master
         self.bridge = bridge
-        self._update_thread = None
+        self._syncs = master.syncs
+        self._render_lock = threading.Lock()
         self.config = config
 
         # add menus to root
@@ -173,7 +266,7 @@ class MainWindow:
             3,
             1,
             1,
-            initial_text="Movement: arrow-keys\nSelect: enter\nExit: esc\nQuit: q\nWallpaper colors: w",
+            initial_text="Movement: arrow-keys\nSelect: enter\nExit: esc\nQuit: q\nWallpaper colors: w\nStats: s",
         )
         self.key_menu.set_selectable(False)
         self.light_menu = self.master.add_light_menu("Lights", 1, 0, 2, 2)
@@ -184,9 +277,17 @@ class MainWindow:
 
         # add keybindings
         self.master.add_key_command(Keys.KEY_W_LOWER, self._set_wallpaper_colors)
+        self.master.add_key_command(Keys.KEY_S_LOWER, self._show_stats)
+
+        # serve metrics while running
+        if "port" in config.metrics_settings:
+            self.bridge.metrics.serve(config.metrics_settings["port"])
 
         # hook stop function to exit
-        self.master.run_on_exit(self._stop_active_devices_thread)
+        self.master.run_on_exit(self._on_exit)
+
+        # show command results on redraw
+        self.master.set_on_draw_update_func(self.master.post_results)
 
         # refresh every 10ms
         self.master.set_refresh_timeout(0.1)
@@ -195,7 +296,7 @@ class MainWindow:
         if config.tui_settings["unicode"]:
             self.master.toggle_unicode_borders()
 
-        # start update thread
+        # start poller
         self._init_active_devices_thread()
 
         # set ui colors
@@ -219,37 +320,70 @@ class MainWindow:
 
         self.active_menu.set_selected_color(config.tui_settings["uicolors"]["main_ui"])
 
-    def _update_active_menu(self) -> None:
-        """update the active menu with the active devices"""
-        t = threading.currentThread()
+    def _update_active_menu(self, events: list = None) -> None:
+        """update the active menu with the active devices
 
-        # should de thread be running?
-        while getattr(t, "do_run", True):
+        Args:
+            events (list, optional): light changes that triggered the update. Defaults to None.
+        """
+        # every bridge's sync calls this from its own thread
+        with tracer.span("active_menu", "render"), self._render_lock:
             # list for all active devices
             active = []
 
+            # render from the cache, a refetch here would block the sync
+            # thread or delay the write that triggered the update
             for light in self.bridge.lights:
-                if light.on:
+                if light.get_cached_param(Parameter.ON):
+                    brightness = light.get_cached_param(Parameter.BRIGHTNESS)
+                    if brightness is not None:
+                        brightness = light.value_to_percent(brightness, 255)
+
                     # add light to active list
-                    format_str = f"({light.brightness}%) {light.name}"
+                    format_str = f"({brightness}%) {self.bridge.name_of(light)}"
                     active.append(format_str)
 
             # refresh active menu
             self.active_menu.clear()
             self.active_menu.add_item_list(active)
 
-            time.sleep(0.1)
-
     def _init_active_devices_thread(self) -> None:
-        """initializes the thread that updates the active devices menu"""
-        # create new thread and start it
-        self._update_thread = threading.Thread(target=self._update_active_menu)
-        self._update_thread.start()
+        """initializes the state syncs that update the active devices menu"""
+        self._update_active_menu()
+        self.bridge.subscribe(self._update_active_menu, "lights")
+
+        # one sync per bridge, so a slow bridge doesn't hold up the others
+        for bridge in self.bridge.bridges:
+            # push updates replace polling if the bridge supports them
+            if self.config.eventstream:
+                sync = EventStream(bridge, **self.config.eventstream_settings)
+            else:
+                sync = StatePoller(bridge, **self.config.poll_settings)
+            sync.start()
+            self._syncs.append(sync)
 
     def _stop_active_devices_thread(self) -> None:
-        """stops the active devices update thread"""
-        # stop the thread
-        self._update_thread.do_run = False
+        """stops the active devices state syncs"""
+        self.bridge.unsubscribe(self._update_active_menu, "lights")
+        for sync in self._syncs:
+            sync.stop()
+
+    def _on_exit(self) -> None:
+        """stops the state sync, sends the remaining queued writes and exports metrics"""
+        self._stop_active_devices_thread()
+        self.master.accumulator.flush()
+        self.master.executor.shutdown()
+        self.bridge.close()
+
+        self.bridge.metrics.stop_serving()
+        if "file" in self.config.metrics_settings:
+            self.bridge.metrics.write(self.config.metrics_settings["file"])
+
+    def _show_stats(self) -> None:
+        """shows the bridge traffic stats in a popup"""
+        self.master.show_menu_popup(
+            "Bridge stats", self.bridge.metrics.summary(), lambda _: None
+        )
 
     def _get_logo_text(self) -> str:
         """returns the logo banner with linebreaks"""
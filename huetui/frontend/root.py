@@ -1,12 +1,12 @@
 from huetui.frontend.main_window import MainWindow, extPyCUI
-from huetui.backend.bridge import Bridge
+from huetui.backend.bridgeset import BridgeSet
 from huetui.backend.utils import Config
 
 
 class Root:
     """Root class for the frontend."""
     def __init__(
-        self, x: int, y: int, title: str, bridge: Bridge, config: Config
+        self, x: int, y: int, title: str, bridge: BridgeSet, config: Config
     ) -> None:
         root = extPyCUI(x, y, bridge)
         root.set_title(title)
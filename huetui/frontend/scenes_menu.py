@@ -3,7 +3,8 @@ import py_cui.grid as Grid
 import py_cui.widgets as Widgets
 
 from py_cui.debug import PyCUILogger as Logger
-from huetui.backend.bridge import Bridge
+from huetui.backend.bridgeset import BridgeSet
+from huetui.backend.trace import traced
 
 
 class SceneMenu(Widgets.ScrollMenu):
@@ -19,7 +20,7 @@ class SceneMenu(Widgets.ScrollMenu):
         padx (int): x padding
         pady (int): y padding
         logger (Logger): logger object
-        bridge (Bridge): bridge object
+        bridge (BridgeSet): bridges to control
     """
 
     def __init__(
@@ -34,12 +35,11 @@ class SceneMenu(Widgets.ScrollMenu):
         padx: int,
         pady: int,
         logger: Logger,
-        bridge: Bridge,
+        bridge: BridgeSet,
         master,
     ) -> None:
         self.bridge = bridge
         self.scenes = bridge.scenes
-        self.groups = bridge.groups
         self.master = master
         super(SceneMenu, self).__init__(
             id, title, grid, row, column, row_span, column_span, padx, pady, logger
@@ -49,16 +49,20 @@ class SceneMenu(Widgets.ScrollMenu):
             " ENTER to select,"
             " ESC to exit"
         )
-        self.add_item_list([scene.name for scene in self.scenes])
+        self.add_item_list([bridge.name_of(scene) for scene in self.scenes])
         self.add_key_command(Keys.KEY_ENTER, self.popup)
 
     def popup(self) -> None:
         """popup to select which group to set the scene to"""
-        groups = [group.name for group in self.groups]
+        # a scene can only be set to the groups of its own bridge
+        scene = self.scenes[self.get_selected_item_index()]
+        bridge = self.bridge.bridge_of(scene)
+        groups = bridge.groups if bridge is not None else []
         self.master.show_menu_popup(
-            "To which group?", [group.name for group in self.groups], self.set_scene
+            "To which group?", [group.name for group in groups], self.set_scene
         )
 
+    @traced
     def set_scene(self, group: str) -> None:
         """set scene to a group. needs to be called from popup.
 
@@ -66,5 +70,17 @@ class SceneMenu(Widgets.ScrollMenu):
             group (str): group name to set the scene to
         """
         scene = self.scenes[self.get_selected_item_index()]
-        target = self.bridge.group_by_name(group)
-        scene.set_to_group(target)
+        bridge = self.bridge.bridge_of(scene)
+        target = bridge.group_by_name(group) if bridge is not None else None
+
+        # the scene or group was removed from the bridge meanwhile
+        if target is None:
+            self.master.show_error_popup("Scene", f"{scene.name} or {group} is gone")
+            return
+
+        self.master.run_command(
+            f"Scene {scene.name} to {group}",
+            scene.set_to_group,
+            target,
+            key=self.bridge.topic_of(target),
+        )
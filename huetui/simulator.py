@@ -0,0 +1,522 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from huetui.backend.scheduler import CommandScheduler, TokenBucket
+import argparse
+import copy
+import json
+import queue
+import random
+import sys
+import threading
+import time
+
+
+class SimulatedBridge:
+    """Class simulating the v1 api of a philips hue bridge in memory.
+
+    Implements the endpoints huetui uses, paces light and group commands
+    like a real bridge and can inject latency and errors.
+
+    Args:
+        lights (int, optional): number of lights. Defaults to 10.
+        groups (int, optional): number of groups. Defaults to 3.
+        scenes (int, optional): number of scenes. Defaults to 5.
+        api_user (str, optional): the only authorized api user. Defaults to "simulator".
+        latency (float, optional): seconds added to every request. Defaults to 0.
+        jitter (float, optional): random seconds added on top of the latency. Defaults to 0.
+        rate_limit (bool, optional): answer 503 above the bridge's command rates. Defaults to True.
+        light_rate (float, optional): light commands per second. Defaults to 10.
+        group_rate (float, optional): group commands per second. Defaults to 1.
+        error_rate (float, optional): fraction of requests answered with an api error. Defaults to 0.
+        seed (int, optional): seed of the error injection. Defaults to None.
+
+    Attributes:
+        lights (dict): light documents by id
+        groups (dict): group documents by id
+        scenes (dict): scene documents by id
+        config (dict): bridge metadata
+        stats (dict): request counters, see reset_stats
+    """
+
+    MAX_GROUPS = 64
+
+    def __init__(
+        self,
+        lights: int = 10,
+        groups: int = 3,
+        scenes: int = 5,
+        api_user: str = "simulator",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: bool = True,
+        light_rate: float = 10.0,
+        group_rate: float = 1.0,
+        error_rate: float = 0.0,
+        seed: int = None,
+    ) -> None:
+        self.api_user = api_user
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+
+        self._random = random.Random(seed)
+        self._buckets = {
+            "lights": TokenBucket(light_rate, light_rate),
+            "groups": TokenBucket(group_rate, group_rate),
+        }
+        self._lock = threading.RLock()
+        self._listeners = []
+
+        self.lights = {
+            str(lid): {
+                "name": f"Light {lid}",
+                "type": "Extended color light",
+                "state": {
+                    "on": lid % 2 == 0,
+                    "bri": 127,
+                    "hue": (lid * 4000) % 65536,
+                    "sat": 200,
+                    "xy": [0.3, 0.3],
+                    "ct": 300,
+                    "alert": "none",
+                    "effect": "none",
+                    "colormode": "hs",
+                    "reachable": True,
+                },
+            }
+            for lid in range(1, lights + 1)
+        }
+        lids = list(self.lights)
+
+        self.groups = {
+            str(gid): {
+                "name": f"Group {gid}",
+                "type": "Room",
+                "lights": lids[gid - 1 :: groups],
+                "action": {"on": True, "bri": 127, "hue": 0, "sat": 200},
+            }
+            for gid in range(1, groups + 1)
+        }
+        self.scenes = {
+            f"scene{sid}": {
+                "name": f"Scene {sid}",
+                "type": "LightScene",
+                "lights": lids[sid - 1 :: scenes],
+                "lightstates": {
+                    lid: {"on": True, "bri": (sid * 50) % 254 + 1}
+                    for lid in lids[sid - 1 :: scenes]
+                },
+            }
+            for sid in range(1, scenes + 1)
+        }
+        self.config = {
+            "name": "huetui simulator",
+            "bridgeid": "001788FFFE000000",
+            "mac": "00:17:88:00:00:00",
+            "ipaddress": "127.0.0.1",
+            "swversion": "1950207110",
+            "apiversion": "1.50.0",
+        }
+
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """reset the request counters"""
+        with self._lock:
+            self.stats = {
+                "requests": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "rate_limited": 0,
+                "errors": 0,
+                "endpoints": {},
+            }
+
+    def count(self, endpoint: str, bytes_in: int, bytes_out: int) -> None:
+        """count one answered request
+
+        Args:
+            endpoint (str): method and path pattern, e.g. "PUT /lights/{id}/state"
+            bytes_in (int): size of the request body
+            bytes_out (int): size of the response body
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+            endpoints = self.stats["endpoints"]
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+
+    def listen(self) -> queue.Queue:
+        """register a queue receiving v2 events of every change
+
+        Returns:
+            Queue: receives lists of v2 update events
+        """
+        listener = queue.Queue()
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def unlisten(self, listener: queue.Queue) -> None:
+        """remove a queue registered with listen
+
+        Args:
+            listener (Queue): queue to remove
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, lid: str) -> None:
+        """send the current state of a light to all event stream listeners"""
+        state = self.lights[lid]["state"]
+        event = [
+            {
+                "type": "update",
+                "creationtime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "data": [
+                    {
+                        "type": "light",
+                        "id_v1": f"/lights/{lid}",
+                        "on": {"on": state["on"]},
+                        "dimming": {"brightness": state["bri"] / 255 * 100},
+                    }
+                ],
+            }
+        ]
+
+        for listener in self._listeners:
+            listener.put(event)
+
+    def _group_document(self, gid: str) -> dict:
+        """group document with its state derived from its lights"""
+        group = dict(self.groups[gid])
+        on = [self.lights[lid]["state"]["on"] for lid in group["lights"]]
+        group["state"] = {"all_on": bool(on) and all(on), "any_on": any(on)}
+        return group
+
+    def _set_light(self, lid: str, values: dict) -> list:
+        """apply state values to a light
+
+        Returns:
+            list: success entries of the response
+        """
+        state = self.lights[lid]["state"]
+        success = []
+
+        for key, value in values.items():
+            if key == "transitiontime":
+                continue
+            state[key] = value
+            success.append({"success": {f"/lights/{lid}/state/{key}": value}})
+
+        self._notify(lid)
+        return success
+
+    @staticmethod
+    def error(kind: int, address: str, description: str) -> list:
+        """build an api error response
+
+        Args:
+            kind (int): hue error type
+            address (str): resource the error refers to
+            description (str): error message
+
+        Returns:
+            list: error response
+        """
+        return [{"error": {"type": kind, "address": address, "description": description}}]
+
+    def handle(self, method: str, path: str, body: dict):
+        """answer one api request
+
+        Args:
+            method (str): http method
+            path (str): request path, e.g. "/api/<user>/lights"
+            body (dict): parsed request body, None if empty
+
+        Returns:
+            tuple: http status, response payload and endpoint pattern
+        """
+        parts = [part for part in path.split("/") if part]
+        if len(parts) < 2 or parts[0] != "api":
+            return 404, self.error(4, path, "method, GET, not available"), "unknown"
+
+        if parts[1] != self.api_user:
+            return 200, self.error(1, "/", "unauthorized user"), "unauthorized"
+
+        resource = parts[2:]
+        endpoint = method + " /" + "/".join(
+            "{id}" if i == 1 else part for i, part in enumerate(resource)
+        )
+
+        with self._lock:
+            # commands are paced like on a real bridge
+            if self.rate_limit and method in ("PUT", "POST", "DELETE"):
+                # only group actions count against the group command limit
+                lane = CommandScheduler.lane_of(path, method)
+                bucket = self._buckets[lane]
+                if bucket.delay() > 0:
+                    self.stats["rate_limited"] += 1
+                    return 503, self.error(901, path, "Internal error, 503"), endpoint
+                bucket.take()
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 200, self.error(901, path, "Internal error, 404"), endpoint
+
+            try:
+                # copy so the response is serialized outside the lock safely
+                return 200, copy.deepcopy(self._route(method, resource, body)), endpoint
+            except (KeyError, IndexError, ValueError, TypeError):
+                return 200, self.error(3, path, "resource not available"), endpoint
+
+    def _route(self, method: str, resource: list, body: dict):
+        """dispatch a request to the simulated datastore"""
+        if method == "GET":
+            if not resource:
+                return {
+                    "lights": self.lights,
+                    "groups": {gid: self._group_document(gid) for gid in self.groups},
+                    "scenes": self.scenes,
+                    "config": self.config,
+                }
+            if resource == ["groups"]:
+                return {gid: self._group_document(gid) for gid in self.groups}
+            if resource[0] == "groups":
+                return self._group_document(resource[1])
+
+            document = {
+                "lights": self.lights,
+                "scenes": self.scenes,
+                "config": self.config,
+            }[resource[0]]
+            for part in resource[1:]:
+                document = document[part]
+            return document
+
+        if method == "PUT" and resource[0] == "lights" and resource[2:] == ["state"]:
+            return self._set_light(resource[1], body)
+
+        if method == "PUT" and resource[0] == "groups" and resource[2:] == ["action"]:
+            group = self.groups[resource[1]]
+            success = []
+
+            if "scene" in body:
+                scene = self.scenes[body["scene"]]
+                for lid, values in scene["lightstates"].items():
+                    self._set_light(lid, values)
+
+            values = {k: v for k, v in body.items() if k != "scene"}
+            for lid in group["lights"]:
+                self._set_light(lid, values)
+            group["action"].update(values)
+
+            for key, value in body.items():
+                success.append({"success": {f"/groups/{resource[1]}/action/{key}": value}})
+            return success
+
+        if method == "POST" and resource == ["groups"]:
+            if len(self.groups) >= self.MAX_GROUPS:
+                return self.error(11, "/groups/", "too many items in list")
+            gid = str(max([int(gid) for gid in self.groups] + [0]) + 1)
+            self.groups[gid] = {
+                "name": body.get("name", f"Group {gid}"),
+                "type": body.get("type", "LightGroup"),
+                "lights": [str(lid) for lid in body["lights"]],
+                "action": {"on": False},
+            }
+            return [{"success": {"id": gid}}]
+
+        if method == "DELETE" and resource[0] == "groups" and len(resource) == 2:
+            del self.groups[resource[1]]
+            return [{"success": f"/groups/{resource[1]} deleted"}]
+
+        raise KeyError(resource)
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    """Request handler serving a SimulatedBridge over http."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(
+        self, status: int, payload, endpoint: str = None, bytes_in: int = 0
+    ) -> None:
+        data = json.dumps(payload).encode("utf-8")
+
+        # count before answering, the stats are complete once the client has it
+        if endpoint is not None:
+            self.server.bridge.count(endpoint, bytes_in, len(data))
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self) -> None:
+        bridge = self.server.bridge
+
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+
+        delay = bridge.latency + bridge._random.uniform(0, bridge.jitter)
+        if delay:
+            time.sleep(delay)
+
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            error = bridge.error(2, self.path, "body contains invalid json")
+            self._send(200, error, self.command + " invalid", len(raw))
+            return
+
+        status, payload, endpoint = bridge.handle(self.command, self.path, body)
+        self._send(status, payload, endpoint, len(raw))
+
+    def _stream(self) -> None:
+        """serve the v2 event stream"""
+        bridge = self.server.bridge
+        if self.headers.get("hue-application-key") != bridge.api_user:
+            self._send(403, bridge.error(1, "/", "unauthorized user"))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        listener = bridge.listen()
+        try:
+            self.wfile.write(b": hi\n\n")
+            self.wfile.flush()
+
+            while self.server.running:
+                try:
+                    event = listener.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                self.wfile.write(f"id: {time.time()}:0\ndata: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+
+        except OSError:
+            pass
+        finally:
+            bridge.unlisten(listener)
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/eventstream/clip/v2"):
+            self._stream()
+        else:
+            self._handle()
+
+    do_PUT = _handle
+    do_POST = _handle
+    do_DELETE = _handle
+
+
+class Simulator(ThreadingHTTPServer):
+    """Http server running a SimulatedBridge.
+
+    Args:
+        bridge (SimulatedBridge, optional): bridge to serve. Defaults to a bridge with 10 lights.
+        host (str, optional): address to listen on. Defaults to "127.0.0.1".
+        port (int, optional): port to listen on, 0 picks a free one. Defaults to 0.
+
+    Example:
+        with Simulator(SimulatedBridge(lights=50)) as sim:
+            bridge = Bridge(sim.url)
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(
+        self, bridge: SimulatedBridge = None, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.bridge = bridge if bridge is not None else SimulatedBridge()
+        self.running = False
+        self._thread = None
+        super(Simulator, self).__init__((host, port), SimulatorHandler)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.address}/api/{self.bridge.api_user}"
+
+    def handle_error(self, request, client_address) -> None:
+        # clients giving up on slow responses are expected, e.g. on timeouts
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super(Simulator, self).handle_error(request, client_address)
+
+    def start(self) -> "Simulator":
+        """serve requests from a background thread"""
+        self.running = True
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """stop serving and close the socket"""
+        self.running = False
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "Simulator":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulated philips hue bridge")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--api-user", default="simulator")
+    parser.add_argument("--lights", type=int, default=10)
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--scenes", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-rate-limit", action="store_true")
+    args = parser.parse_args()
+
+    bridge = SimulatedBridge(
+        lights=args.lights,
+        groups=args.groups,
+        scenes=args.scenes,
+        api_user=args.api_user,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=not args.no_rate_limit,
+        error_rate=args.error_rate,
+    )
+    simulator = Simulator(bridge, args.host, args.port)
+
+    print(f"Simulating a bridge at {simulator.url}")
+    print(f'Use c.ip = "{simulator.address}" and c.api_user = "{args.api_user}"')
+
+    simulator.running = True
+    try:
+        simulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.running = False
+        simulator.server_close()
@@ -13,11 +13,11 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/channel-42/hue-tui",
-    scripts=["bin/huetui"],
+    scripts=["bin/huetui", "bin/huetui-sim"],
     packages=setuptools.find_packages(),
     python_requires='>=3.10',
     install_requires=[
-        "urllib3",
+        "urllib3>=2.3",
         "click",
         "typing",
         "py-cui",
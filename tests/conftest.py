@@ -0,0 +1,47 @@
+from huetui.backend.bridge import Bridge
+from huetui.backend.bridgeset import BridgeSet
+from huetui.frontend.main_window import MainWindow
+from huetui.simulator import Simulator, SimulatedBridge
+import threading
+import pytest
+
+
+class Menu:
+    """stands in for the curses menu the active lights are rendered to"""
+
+    def __init__(self) -> None:
+        self.items = []
+
+    def clear(self) -> None:
+        self.items = []
+
+    def add_item_list(self, items: list) -> None:
+        self.items += items
+
+
+@pytest.fixture
+def simulator():
+    """simulated bridge without rate limits, so tests don't wait for pacing"""
+    with Simulator(SimulatedBridge(lights=6, groups=2, scenes=2, rate_limit=False)) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def bridge(simulator):
+    bridge = Bridge(simulator.url)
+    yield bridge
+    bridge.close()
+
+
+@pytest.fixture
+def render_active():
+    """render the active lights of a bridge like the main window does"""
+
+    def render(bridge: Bridge) -> list:
+        window = MainWindow.__new__(MainWindow)
+        window.bridge, window.active_menu = BridgeSet([bridge]), Menu()
+        window._render_lock = threading.Lock()
+        window._update_active_menu()
+        return window.active_menu.items
+
+    return render
@@ -0,0 +1,42 @@
+from huetui.backend.accumulator import Accumulator
+from huetui.backend.utils import Util
+import time
+
+
+def test_the_first_step_is_applied_right_away_and_later_ones_summed():
+    accumulator = Accumulator()
+    applied = []
+
+    for _ in range(4):
+        accumulator.add("lights/1", 5, applied.append, 0.2)
+    time.sleep(0.05)
+    assert applied == [5]
+
+    time.sleep(0.25)
+    assert applied == [5, 15]
+
+
+def test_keys_are_accumulated_separately():
+    accumulator = Accumulator()
+    applied = []
+
+    accumulator.add("lights/1", 5, lambda step: applied.append(("1", step)), 1.0)
+    accumulator.add("lights/2", -5, lambda step: applied.append(("2", step)), 1.0)
+    time.sleep(0.05)
+
+    assert sorted(applied) == [("1", 5), ("2", -5)]
+
+
+def test_flush_applies_waiting_steps_right_away(simulator, bridge):
+    accumulator = Accumulator()
+    light = bridge.light_by_id(2)
+    simulator.bridge.reset_stats()
+
+    for _ in range(3):
+        accumulator.add(light.topic, 10, light.step_brightness, 5.0)
+    time.sleep(0.05)
+    accumulator.flush()
+
+    # 50% plus 10% right away and the remaining 20% together
+    assert simulator.bridge.stats["requests"] == 2
+    assert simulator.bridge.lights["2"]["state"]["bri"] == Util.percent_to_value(80, 255)
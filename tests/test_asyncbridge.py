@@ -0,0 +1,57 @@
+from huetui.backend.asyncbridge import AsyncBridge
+from huetui.backend.light import RGB
+import asyncio
+
+
+def test_lights_are_set_concurrently(simulator, bridge):
+    async def main():
+        async_bridge = AsyncBridge(bridge)
+        return await async_bridge.set_lights(bridge.lights[:3], {"bri": 42})
+
+    assert asyncio.run(main()) == [True] * 3
+    assert all(
+        simulator.bridge.lights[lid]["state"]["bri"] == 42 for lid in ("1", "2", "3")
+    )
+    assert bridge.state.peek("lights", 3)["state"]["bri"] == 42
+
+
+def test_toggle_reads_the_cache(simulator, bridge):
+    simulator.bridge.reset_stats()
+
+    async def main():
+        return await AsyncBridge(bridge).toggle(bridge.light_by_id(1))
+
+    assert asyncio.run(main())
+    assert simulator.bridge.lights["1"]["state"]["on"] is True
+    assert simulator.bridge.stats["endpoints"] == {"PUT /lights/{id}/state": 1}
+
+
+def test_failed_writes_are_rolled_back(simulator, bridge):
+    simulator.bridge.error_rate = 1.0
+
+    async def main():
+        return await AsyncBridge(bridge).set_color(bridge.light_by_id(1), RGB(255, 0, 0))
+
+    assert asyncio.run(main()) is False
+    assert bridge.state.peek("lights", 1)["state"]["bri"] == 127
+    assert bridge.metrics.counter("huetui_command_failures") == 1
+
+
+def test_connect_does_not_block_the_event_loop(simulator):
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.ensure_future(tick())
+        async_bridge = await AsyncBridge.connect(simulator.url)
+        ticker.cancel()
+        async_bridge.bridge.close()
+        return ticks, len(async_bridge.lights)
+
+    ticks, lights = asyncio.run(main())
+    assert ticks > 1 and lights == 6
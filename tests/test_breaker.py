@@ -0,0 +1,43 @@
+from huetui.backend.breaker import BridgeUnavailable, CircuitBreaker
+import time
+import pytest
+
+
+def test_opens_after_failures_in_a_row():
+    breaker = CircuitBreaker(failure_threshold=3)
+
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    assert not breaker.failure() and not breaker.failure()
+    assert breaker.failure()
+
+    with pytest.raises(BridgeUnavailable):
+        breaker.check()
+
+
+def test_lets_one_trial_through_after_the_recovery_time():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.05)
+    breaker.failure()
+    time.sleep(0.05)
+
+    breaker.check()
+    with pytest.raises(BridgeUnavailable):
+        breaker.check()
+
+    breaker.success()
+    assert not breaker.open
+    breaker.check()
+
+
+def test_a_failed_trial_keeps_it_open():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.05)
+    breaker.failure()
+    time.sleep(0.05)
+
+    breaker.check()
+    breaker.failure()
+
+    assert breaker.open
+    with pytest.raises(BridgeUnavailable):
+        breaker.check()
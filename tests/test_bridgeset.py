@@ -0,0 +1,54 @@
+from huetui.backend.bridge import Bridge, BridgeConnectionError
+from huetui.backend.bridgeset import BridgeSet
+from huetui.backend.client import Client
+from huetui.simulator import Simulator, SimulatedBridge
+import pytest
+
+# nothing listens on port 1
+DEAD = "http://127.0.0.1:1/api/user"
+
+
+def connect(url: str):
+    def factory(metrics):
+        return Bridge(url, Client(retries=0, metrics=metrics), startup_timeout=2.0)
+
+    return factory
+
+
+def test_unreachable_bridges_are_skipped(simulator, capsys):
+    bridges = BridgeSet.connect(
+        [connect(DEAD), connect(simulator.url)], ["dead", "alive"]
+    )
+
+    try:
+        assert bridges.names == ["alive"]
+        assert len(bridges.lights) == 6
+        assert "Skipping bridge dead" in capsys.readouterr().out
+    finally:
+        bridges.close()
+
+
+def test_connect_raises_if_no_bridge_could_be_connected(capsys):
+    with pytest.raises(BridgeConnectionError) as error:
+        BridgeSet.connect([connect(DEAD), connect(DEAD)])
+
+    # the api user stays out of the message, nothing but the warning is printed
+    assert "user" not in str(error.value)
+    assert "Traceback" not in capsys.readouterr().err
+
+
+def test_unknown_entities_belong_to_no_bridge(simulator, bridge):
+    bridges = BridgeSet([bridge])
+    light = bridge.light_by_id(1)
+    assert bridges.bridge_of(light) is bridge
+
+    with Simulator(SimulatedBridge(lights=1)) as other:
+        stranger = Bridge(other.url)
+        try:
+            assert bridges.bridge_of(stranger.light_by_id(1)) is None
+            assert bridges.topic_of(stranger.light_by_id(1)) is None
+        finally:
+            stranger.close()
+
+    assert bridges.bridge_of(None) is None
+    assert bridges.topic_of(light) == "0/" + light.topic
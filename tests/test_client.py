@@ -0,0 +1,74 @@
+from concurrent.futures import ThreadPoolExecutor
+from huetui.backend.client import Client
+import pytest
+import time
+
+
+def get_concurrently(client: Client, address: str, callers: int = 5) -> list:
+    with ThreadPoolExecutor(callers) as pool:
+        futures = [pool.submit(client.get, address) for _ in range(callers)]
+        return [future.exception() or future.result() for future in futures]
+
+
+def test_concurrent_gets_of_one_address_share_a_request(simulator):
+    simulator.bridge.latency = 0.2
+    client = Client()
+
+    payloads = get_concurrently(client, simulator.url + "/lights")
+
+    assert simulator.bridge.stats["endpoints"] == {"GET /lights": 1}
+    assert all(payload == payloads[0] for payload in payloads)
+    assert client.metrics.counter("huetui_shared_gets", result="joined") == 4
+
+    # every caller got its own copy
+    payloads[0]["1"]["name"] = "changed"
+    assert payloads[1]["1"]["name"] == "Light 1"
+
+
+def test_gets_of_different_addresses_are_not_shared(simulator):
+    client = Client()
+
+    with ThreadPoolExecutor(2) as pool:
+        list(pool.map(client.get, [simulator.url + "/lights", simulator.url + "/groups"]))
+
+    assert simulator.bridge.stats["requests"] == 2
+
+
+def test_a_failed_get_fails_every_caller(simulator):
+    simulator.bridge.latency = 0.2
+    simulator.bridge.error_rate = 1.0
+
+    client = Client()
+    errors = get_concurrently(client, simulator.url + "/lights")
+
+    assert all(isinstance(error, Exception) for error in errors)
+    assert simulator.bridge.stats["requests"] == 1
+
+    # the failed request isn't shared with later callers
+    simulator.bridge.error_rate = 0.0
+    assert "1" in client.get(simulator.url + "/lights")
+
+
+def test_a_trial_that_raised_settles_the_breaker(simulator, monkeypatch):
+    client = Client(failure_threshold=1, recovery_time=0.05)
+    client.breaker.failure()
+    time.sleep(0.05)
+
+    # an error urllib3 doesn't wrap
+    def send(*args, **kwargs):
+        raise ConnectionResetError("reset by peer")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(client, "_send", send)
+        with pytest.raises(ConnectionResetError):
+            client.get(simulator.url + "/lights")
+
+    time.sleep(0.05)
+    assert "1" in client.get(simulator.url + "/lights")
+    assert not client.breaker.open
+
+
+def test_unset_timeouts_are_limited_by_the_deadline(simulator):
+    client = Client(connect_timeout=None, read_timeout=None)
+
+    assert "1" in client.get(simulator.url + "/lights")
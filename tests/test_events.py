@@ -0,0 +1,45 @@
+from huetui.backend.events import Delta, EventBus, StateEvent, diff
+
+
+def test_events_reach_the_subscribers_of_every_matching_topic():
+    bus = EventBus()
+    received = {topic: [] for topic in ("bridge", "lights", "lights/1", "groups")}
+    for topic, events in received.items():
+        bus.subscribe(events.extend, topic)
+
+    light = StateEvent("lights", "1", {"state.on": Delta(False, True)})
+    other = StateEvent("lights", "2", {"state.on": Delta(True, False)})
+    bus.publish([light, other])
+
+    assert received["bridge"] == [light, other]
+    assert received["lights"] == [light, other]
+    assert received["lights/1"] == [light]
+    assert received["groups"] == []
+
+
+def test_unsubscribed_callbacks_are_not_called():
+    bus = EventBus()
+    events = []
+    bus.subscribe(events.extend, "lights")
+    bus.unsubscribe(events.extend, "lights")
+
+    bus.publish([StateEvent("lights", "1")])
+
+    assert events == []
+
+
+def test_diff_reports_changed_fields_by_dotted_path():
+    old = {"name": "Light 1", "state": {"on": False, "bri": 10}}
+    new = {"name": "Light 1", "state": {"on": True, "bri": 10}}
+
+    assert diff(old, new) == {"state.on": Delta(False, True)}
+    assert diff({}, {"name": "New"}) == {"name": Delta(None, "New")}
+
+
+def test_bridge_publishes_local_writes(simulator, bridge):
+    events = []
+    bridge.subscribe(events.extend, "lights/1")
+
+    bridge.light_by_id(1).on = True
+
+    assert events and events[0].changes["state.on"] == Delta(False, True)
@@ -0,0 +1,91 @@
+from huetui.backend.client import Client
+from huetui.backend.eventstream import EventStream
+import json
+import time
+import pytest
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def stream(simulator, bridge):
+    url = simulator.url.split("/api/")[0] + "/eventstream/clip/v2"
+    stream = EventStream(bridge, url=url, reconnect_delay=0.05)
+    yield stream
+    stream.stop()
+
+
+def put(simulator, lid: int, state: dict) -> None:
+    # a change made by another app
+    Client().put(simulator.url + f"/lights/{lid}/state", json.dumps(state))
+
+
+def test_pushed_changes_are_applied_without_requests(
+    simulator, bridge, stream, render_active
+):
+    simulator.bridge.reset_stats()
+    stream.start()
+    # connected once the missed changes were refetched
+    assert wait_for(lambda: simulator.bridge.stats["endpoints"].get("GET /lights"))
+    simulator.bridge.reset_stats()
+
+    for bri in (10, 20, 30, 40, 50):
+        put(simulator, 1, {"on": True, "bri": bri})
+    time.sleep(1.1)  # past the state store's ttl
+
+    assert wait_for(lambda: bridge.state.peek("lights", 1)["state"]["bri"] == 50)
+
+    assert "(20%) Light 1" in render_active(bridge)
+    assert simulator.bridge.stats["endpoints"] == {"PUT /lights/{id}/state": 5}
+
+
+def test_missed_changes_are_refetched_on_connect(simulator, bridge, stream):
+    simulator.bridge.lights["1"]["state"]["bri"] = 1
+
+    stream.start()
+
+    assert wait_for(lambda: bridge.state.peek("lights", 1)["state"]["bri"] == 1)
+    assert not stream.degraded
+
+
+def test_failures_are_reported_once_and_mark_the_stream_degraded(bridge):
+    stream = EventStream(bridge, url="http://127.0.0.1:1/eventstream", reconnect_delay=0.01)
+    stream.start()
+
+    try:
+        assert wait_for(lambda: stream.degraded)
+        time.sleep(0.1)
+        assert bridge.metrics.counter("huetui_command_failures") == 1
+    finally:
+        stream.stop()
+
+
+def test_colors_are_translated_to_hue_and_saturation(bridge):
+    stream = EventStream(bridge)
+
+    stream.handle_message(
+        [
+            {
+                "type": "update",
+                "data": [
+                    {
+                        "type": "light",
+                        "id_v1": "/lights/1",
+                        "color": {"xy": {"x": 0.675, "y": 0.322}},
+                    }
+                ],
+            }
+        ]
+    )
+
+    state = bridge.state.peek("lights", 1)["state"]
+    assert state["xy"] == [0.675, 0.322]
+    assert state["hue"] < 5000 and state["sat"] > 240
+    assert not bridge.state.is_stale("lights")
@@ -0,0 +1,53 @@
+from huetui.backend.executor import CommandExecutor
+import threading
+import time
+
+
+def test_commands_of_one_key_run_in_order_one_at_a_time():
+    executor = CommandExecutor()
+    order = []
+    running = []
+    overlaps = []
+
+    def command(i):
+        running.append(i)
+        overlaps.append(len(running))
+        time.sleep(0.01)
+        order.append(i)
+        running.remove(i)
+
+    for i in range(5):
+        executor.submit(f"step {i}", command, i, key="lights/1")
+    executor.shutdown()
+
+    assert order == list(range(5))
+    assert max(overlaps) == 1
+
+
+def test_commands_of_different_keys_run_concurrently():
+    executor = CommandExecutor()
+    barrier = threading.Barrier(2, timeout=2)
+
+    executor.submit("light 1", barrier.wait, key="lights/1")
+    executor.submit("light 2", barrier.wait, key="lights/2")
+    executor.shutdown()
+
+    results = executor.drain()
+    assert [result.error for result in results] == [None, None]
+
+
+def test_results_and_errors_are_drained(simulator, bridge):
+    executor = CommandExecutor()
+
+    def fail():
+        raise ValueError("nope")
+
+    executor.submit("toggle", bridge.light_by_id(1).toggle)
+    executor.submit("fail", fail)
+    executor.shutdown()
+
+    results = {result.description: result for result in executor.drain()}
+    assert results["toggle"].error is None
+    assert isinstance(results["fail"].error, ValueError)
+    assert simulator.bridge.lights["1"]["state"]["on"] is True
+    assert executor.pending == 0 and executor.drain() == []
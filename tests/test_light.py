@@ -0,0 +1,40 @@
+from huetui.backend.light import Parameter
+import threading
+
+
+def test_batches_merge_changes_into_one_request(simulator, bridge):
+    light = bridge.light_by_id(1)
+    simulator.bridge.reset_stats()
+
+    with light.batch():
+        light.put_api_param(Parameter.ON, True)
+        light.put_api_param(Parameter.BRIGHTNESS, 10)
+        assert simulator.bridge.stats["requests"] == 0
+
+    assert simulator.bridge.stats["requests"] == 1
+    assert simulator.bridge.lights["1"]["state"]["bri"] == 10
+
+
+def test_batches_are_kept_per_thread(simulator, bridge):
+    light = bridge.light_by_id(1)
+    batching = threading.Event()
+    sent = threading.Event()
+
+    def other():
+        batching.wait(5)
+        light.put_api_param(Parameter.BRIGHTNESS, 10)
+        sent.set()
+
+    thread = threading.Thread(target=other)
+    thread.start()
+
+    with light.batch():
+        light.put_api_param(Parameter.ON, True)
+        batching.set()
+        assert sent.wait(5)
+        # the other thread's write went out alone
+        assert simulator.bridge.lights["1"]["state"]["on"] is False
+        assert simulator.bridge.lights["1"]["state"]["bri"] == 10
+
+    thread.join()
+    assert simulator.bridge.lights["1"]["state"]["on"] is True
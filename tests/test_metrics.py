@@ -0,0 +1,50 @@
+from huetui.backend.metrics import Metrics, endpoint_of
+import re
+import urllib3
+
+
+def test_addresses_are_reduced_to_endpoints():
+    assert endpoint_of("http://10.0.0.2/api/user/lights/3/state") == "/lights/{id}/state"
+    assert endpoint_of("http://10.0.0.2/api/user") == "/"
+
+
+def test_every_family_is_exported_with_type_and_help(simulator, bridge):
+    bridge.light_by_id(1).on = True
+    bridge.metrics.error(Exception("failed"))
+
+    text = bridge.metrics.to_openmetrics()
+
+    families = set(re.findall(r"^# TYPE (\S+) ", text, re.MULTILINE))
+    described = set(re.findall(r"^# HELP (\S+) ", text, re.MULTILINE))
+    assert "huetui_request_duration_seconds" in families
+    assert "huetui_command_failures" in families
+    assert families == described
+    assert "huetui_command_failures_total 1" in text
+    assert text.endswith("# EOF\n")
+
+
+def test_histograms_are_cumulative():
+    metrics = Metrics()
+    for value in (0.001, 0.02, 20.0):
+        metrics.observe("latency", value)
+
+    text = metrics.to_openmetrics()
+
+    assert 'latency_bucket{le="0.005"} 1' in text
+    assert 'latency_bucket{le="0.025"} 2' in text
+    assert 'latency_bucket{le="+Inf"} 3' in text
+    assert "latency_count 3" in text
+
+
+def test_the_export_is_served():
+    metrics = Metrics()
+    metrics.inc("huetui_writes_saved")
+    metrics.serve(0)
+
+    try:
+        host, port = metrics._server.server_address[:2]
+        response = urllib3.request("GET", f"http://{host}:{port}/metrics")
+        assert response.status == 200
+        assert "huetui_writes_saved_total 1" in response.data.decode()
+    finally:
+        metrics.stop_serving()
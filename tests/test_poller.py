@@ -0,0 +1,48 @@
+from huetui.backend.poller import StatePoller
+import time
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_a_poll_reports_whether_anything_changed(simulator, bridge):
+    poller = StatePoller(bridge)
+
+    assert not poller.poll()
+
+    simulator.bridge.lights["1"]["state"]["bri"] = 1
+    assert poller.poll()
+    assert bridge.state.peek("lights", 1)["state"]["bri"] == 1
+
+
+def test_the_interval_backs_off_while_idle_and_resets_on_changes(simulator, bridge):
+    poller = StatePoller(bridge, min_interval=0.01, max_interval=0.05, backoff=2.0)
+    poller.start()
+
+    try:
+        assert wait_for(lambda: poller.interval == 0.05)
+
+        simulator.bridge.lights["1"]["state"]["on"] = True
+        assert wait_for(lambda: poller.interval < 0.05)
+    finally:
+        poller.stop()
+
+
+def test_changes_found_by_polls_are_published(simulator, bridge):
+    poller = StatePoller(bridge, min_interval=0.01, max_interval=0.01)
+    events = []
+    bridge.subscribe(events.extend, "lights/1")
+    poller.start()
+
+    try:
+        simulator.bridge.lights["1"]["name"] = "Desk"
+        assert wait_for(lambda: events)
+        assert events[0].changes["name"].new == "Desk"
+    finally:
+        poller.stop()
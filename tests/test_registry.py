@@ -0,0 +1,44 @@
+import copy
+
+
+def test_renames_are_indexed(simulator, bridge):
+    simulator.bridge.lights["1"]["name"] = "Desk"
+    simulator.bridge.groups["1"]["name"] = "Office"
+    bridge.refresh()
+
+    assert bridge.light_by_name("Desk") is bridge.light_by_id(1)
+    assert bridge.light_by_name("Light 1") is None
+    assert bridge.group_by_name("Office") is bridge.group_by_id(1)
+
+
+def test_member_changes_are_indexed(simulator, bridge):
+    group = bridge.group_by_id(1)
+    light = bridge.light_by_id(2)
+    assert group not in bridge.groups_of(light)
+
+    simulator.bridge.groups["1"]["lights"] = ["2"]
+    bridge.refresh()
+
+    assert group.lights == [light]
+    assert group in bridge.groups_of(light)
+    assert group not in bridge.groups_of(bridge.light_by_id(1))
+
+
+def test_added_and_removed_entities_are_indexed(simulator, bridge):
+    menu = bridge.lights
+    simulated = simulator.bridge
+    simulated.lights["9"] = copy.deepcopy(simulated.lights["1"])
+    simulated.lights["9"]["name"] = "Lamp"
+    simulated.scenes["scene1"]["lights"].append("9")
+    del simulated.lights["1"]
+    for document in list(simulated.groups.values()) + list(simulated.scenes.values()):
+        document["lights"] = [lid for lid in document["lights"] if lid != "1"]
+    bridge.refresh()
+
+    lamp = bridge.light_by_name("Lamp")
+    assert lamp is bridge.light_by_id(9)
+    assert bridge.light_by_id(1) is None
+    assert bridge.scenes_of(lamp) == [bridge.scene_by_id("scene1")]
+    assert all(light.lid != 1 for group in bridge.groups for light in group.lights)
+    # lists handed out before keep matching what was built from them
+    assert len(menu) == 6 and menu[0].lid == 1
@@ -0,0 +1,79 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+from huetui.backend.client import Client
+from huetui.backend.scheduler import CommandScheduler, Priority
+from huetui.simulator import SimulatedBridge, Simulator
+import pytest
+import time
+
+
+@pytest.fixture
+def scheduler():
+    # one light command per 500ms, so everything after the first one queues
+    scheduler = CommandScheduler(Client(), light_rate=2.0, light_burst=1)
+    yield scheduler
+    scheduler.close()
+
+
+def test_queued_writes_to_one_address_are_merged(simulator, scheduler):
+    state = simulator.url + "/lights/{}/state"
+
+    scheduler.submit("PUT", state.format(1), {"on": True})
+    first = scheduler.submit("PUT", state.format(2), {"on": True})
+    second = scheduler.submit("PUT", state.format(2), {"bri": 10})
+
+    assert first.result(5) and second.result(5)
+    assert simulator.bridge.stats["requests"] == 2
+    assert simulator.bridge.lights["2"]["state"]["on"] is True
+    assert simulator.bridge.lights["2"]["state"]["bri"] == 10
+
+
+def test_only_group_actions_use_the_group_lane():
+    assert CommandScheduler.lane_of("/api/u/groups/1/action") == "groups"
+    assert CommandScheduler.lane_of("/api/u/groups/1") == "lights"
+    assert CommandScheduler.lane_of("/api/u/groups", "POST") == "lights"
+    assert CommandScheduler.lane_of("/api/u/lights/1/state") == "lights"
+
+
+def test_interactive_writes_go_before_background_writes(simulator, scheduler):
+    state = simulator.url + "/lights/{}/state"
+
+    scheduler.submit("PUT", state.format(1), {"on": True})
+    background = scheduler.submit(
+        "PUT", state.format(2), {"on": True}, Priority.BACKGROUND
+    )
+    interactive = scheduler.submit("PUT", state.format(3), {"on": True})
+
+    done, _ = wait([background, interactive], 5, FIRST_COMPLETED)
+
+    assert done == {interactive}
+    assert background.result(5)
+
+
+def test_requests_inside_background_blocks_are_background_work(simulator, scheduler):
+    state = simulator.url + "/lights/{}/state"
+
+    scheduler.submit("PUT", state.format(1), {"on": True})
+    with scheduler.background():
+        background = scheduler.submit("PUT", state.format(2), {"on": True})
+    interactive = scheduler.submit("PUT", state.format(3), {"on": True})
+
+    done, _ = wait([background, interactive], 5, FIRST_COMPLETED)
+
+    assert done == {interactive}
+
+
+def test_rate_limited_writes_are_paced_again():
+    with Simulator(SimulatedBridge(lights=2, light_rate=1.0)) as simulator:
+        # paces twice as fast as the bridge allows
+        scheduler = CommandScheduler(Client(), light_rate=1.0, light_burst=2)
+        state = simulator.url + "/lights/{}/state"
+
+        start = time.monotonic()
+        first = scheduler.submit("PUT", state.format(1), {"on": True})
+        second = scheduler.submit("PUT", state.format(2), {"on": True})
+
+        assert first.result(5) and second.result(5)
+        # sent again once the scheduler had a token, not right away
+        assert simulator.bridge.stats["rate_limited"] >= 1
+        assert time.monotonic() - start >= 0.9
+        scheduler.close()
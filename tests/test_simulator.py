@@ -0,0 +1,34 @@
+from huetui.simulator import SimulatedBridge
+
+
+def test_writes_change_the_datastore():
+    bridge = SimulatedBridge(lights=2, rate_limit=False)
+
+    status, response, endpoint = bridge.handle(
+        "PUT", "/api/simulator/lights/1/state", {"on": True, "bri": 10}
+    )
+
+    assert status == 200 and endpoint == "PUT /lights/{id}/state"
+    assert "success" in response[0]
+    assert bridge.lights["1"]["state"]["on"] is True
+    assert bridge.lights["1"]["state"]["bri"] == 10
+
+
+def test_commands_above_the_rate_are_rejected():
+    bridge = SimulatedBridge(lights=2, light_rate=2.0)
+    state = "/api/simulator/lights/{}/state"
+
+    statuses = [bridge.handle("PUT", state.format(1), {"on": True})[0] for _ in range(3)]
+
+    assert statuses == [200, 200, 503]
+    assert bridge.stats["rate_limited"] == 1
+
+
+def test_unknown_users_and_resources_are_errors():
+    bridge = SimulatedBridge(lights=2)
+
+    _, response, _ = bridge.handle("GET", "/api/nobody/lights", None)
+    assert response[0]["error"]["type"] == 1
+
+    _, response, _ = bridge.handle("GET", "/api/simulator/lights/9", None)
+    assert response[0]["error"]["type"] == 3
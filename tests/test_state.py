@@ -0,0 +1,68 @@
+from huetui.backend.state import StateStore
+import time
+
+
+def light(on: bool, bri: int = 100) -> dict:
+    return {"1": {"name": "Light 1", "state": {"on": on, "bri": bri}}}
+
+
+def store(payload: dict) -> StateStore:
+    store = StateStore(lambda resource: payload)
+    store.load("lights", payload)
+    return store
+
+
+def test_optimistic_writes_survive_loads_until_acknowledged():
+    state = store(light(False))
+
+    state.apply("lights", 1, "state", {"on": True})
+    state.load("lights", light(False))
+
+    assert state.peek("lights", 1)["state"]["on"] is True
+
+
+def test_confirmed_writes_survive_polls_started_before_them():
+    state = store(light(False))
+    started = time.monotonic()
+
+    state.apply("lights", 1, "state", {"on": True})
+    state.confirm("lights", 1, "state", {"on": True})
+    state.load("lights", light(False), started)
+    assert state.peek("lights", 1)["state"]["on"] is True
+
+    # a poll sent after the acknowledgement is trusted again
+    state.load("lights", light(False))
+    assert state.peek("lights", 1)["state"]["on"] is False
+
+
+def test_revert_restores_the_previous_value():
+    state = store(light(False))
+
+    previous = state.apply("lights", 1, "state", {"on": True})
+    state.revert("lights", 1, "state", {"on": True}, previous)
+
+    assert state.peek("lights", 1)["state"]["on"] is False
+    state.load("lights", light(False, 50))
+    assert state.peek("lights", 1)["state"] == {"on": False, "bri": 50}
+
+
+def test_revert_leaves_newer_writes_alone():
+    state = store(light(False))
+
+    previous = state.apply("lights", 1, "state", {"on": True, "bri": 200})
+    state.apply("lights", 1, "state", {"bri": 10})
+    state.revert("lights", 1, "state", {"on": True, "bri": 200}, previous)
+
+    assert state.peek("lights", 1)["state"] == {"on": False, "bri": 10}
+
+
+def test_optimistic_renders_send_no_requests(simulator, bridge, render_active):
+    rendered = []
+    bridge.subscribe(lambda events: rendered.append(render_active(bridge)), "lights")
+    bridge.state.ttl = 0
+    simulator.bridge.reset_stats()
+
+    bridge.light_by_id(1).on = True
+
+    assert "(50%) Light 1" in rendered[0]
+    assert simulator.bridge.stats["endpoints"] == {"PUT /lights/{id}/state": 1}
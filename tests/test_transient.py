@@ -0,0 +1,100 @@
+from huetui.backend.bridge import Bridge
+from huetui.backend.scheduler import CommandScheduler
+from huetui.backend.client import Client
+from huetui.backend.transient import TransientGroups
+import threading
+import pytest
+
+
+@pytest.fixture
+def paced(simulator):
+    """bridge whose light burst is smaller than the selections below"""
+    client = Client()
+    bridge = Bridge(simulator.url, client, scheduler=CommandScheduler(client, light_burst=2))
+    yield bridge
+    bridge.close()
+
+
+def test_small_selections_accept_any_v1_field(simulator, bridge):
+    bridge.set_lights(bridge.lights[:2], {"ct": 250, "on": True})
+
+    for lid in ("1", "2"):
+        assert simulator.bridge.lights[lid]["state"]["ct"] == 250
+    assert bridge.state.peek("lights", 1)["state"]["ct"] == 250
+    assert bridge.metrics.counter("huetui_command_failures") == 0
+
+
+def test_large_selections_use_one_transient_group(simulator, paced):
+    simulator.bridge.reset_stats()
+
+    paced.set_lights(paced.lights[:4], {"ct": 250})
+
+    assert simulator.bridge.stats["endpoints"] == {
+        "POST /groups": 1,
+        "PUT /groups/{id}/action": 1,
+    }
+    assert all(simulator.bridge.lights[lid]["state"]["ct"] == 250 for lid in "1234")
+
+
+def test_failed_groups_are_reported_and_fall_back_to_light_writes(
+    simulator, paced, monkeypatch
+):
+    def fail(address, body):
+        raise Exception("Code: 500")
+
+    monkeypatch.setattr(paced, "api_post", fail)
+
+    paced.set_lights(paced.lights[:4], {"bri": 1})
+
+    assert all(simulator.bridge.lights[lid]["state"]["bri"] == 1 for lid in "1234")
+    assert paced.metrics.counter("huetui_transient_group_failures") == 1
+    assert paced.metrics.last_error == "Code: 500"
+    assert "# HELP huetui_transient_group_failures" in paced.metrics.to_openmetrics()
+
+
+def test_known_groups_are_served_while_another_is_created(simulator, paced, monkeypatch):
+    transient = paced.transient
+    known = transient.get(paced.lights[:3])
+    posting = threading.Event()
+    release = threading.Event()
+    post = paced.api_post
+
+    def slow_post(address, body):
+        posting.set()
+        release.wait(5)
+        return post(address, body)
+
+    monkeypatch.setattr(paced, "api_post", slow_post)
+    creator = threading.Thread(target=transient.get, args=(paced.lights[3:],))
+    creator.start()
+
+    try:
+        assert posting.wait(5)
+        served = []
+        reader = threading.Thread(
+            target=lambda: served.append(transient.get(paced.lights[:3]))
+        )
+        reader.start()
+        reader.join(1)
+        assert served == [known]
+    finally:
+        release.set()
+        creator.join()
+
+    assert len(transient.groups) == 2
+
+
+def test_leftover_transient_groups_are_deleted(simulator):
+    simulator.bridge.groups["9"] = {
+        "name": TransientGroups.PREFIX + "leftover",
+        "type": "LightGroup",
+        "lights": ["1"],
+        "action": {"on": False},
+    }
+
+    bridge = Bridge(simulator.url)
+    try:
+        assert "9" not in simulator.bridge.groups
+        assert all(group.gid != 9 for group in bridge.groups)
+    finally:
+        bridge.close()
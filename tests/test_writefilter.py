@@ -0,0 +1,47 @@
+from huetui.backend.light import Parameter
+from huetui.backend.writefilter import WriteFilter
+
+
+def test_fields_every_light_has_are_dropped():
+    documents = [{"on": True, "bri": 100}, {"on": True, "bri": 50}]
+
+    assert WriteFilter().trim(documents, {"on": True, "bri": 100}) == {"bri": 100}
+    assert WriteFilter().trim(documents, {"on": True}) == {}
+
+
+def test_lights_of_unknown_state_are_always_written():
+    changes = {"on": True}
+
+    assert WriteFilter().trim([{"on": True}, None], changes) == changes
+    assert WriteFilter(enabled=False).trim([{"on": True}], changes) == changes
+
+
+def test_differences_within_the_tolerance_are_dropped():
+    write_filter = WriteFilter(tolerance={"bri": 2, "hue": 200})
+
+    assert write_filter.trim([{"bri": 100}], {"bri": 102}) == {}
+    assert write_filter.trim([{"bri": 100}], {"bri": 103}) == {"bri": 103}
+    # hue wraps around
+    assert write_filter.trim([{"hue": 65500}], {"hue": 50}) == {}
+
+
+def test_modifiers_are_only_kept_with_other_fields():
+    documents = [{"on": True, "bri": 100}]
+
+    assert WriteFilter().trim(documents, {"on": True, "transitiontime": 4}) == {}
+    assert WriteFilter().trim(documents, {"bri": 1, "transitiontime": 4}) == {
+        "bri": 1,
+        "transitiontime": 4,
+    }
+
+
+def test_only_skipped_writes_are_counted_as_saved(simulator, bridge):
+    light = bridge.light_by_id(2)
+    simulator.bridge.reset_stats()
+
+    bridge.set_lights([light], {})
+    assert bridge.metrics.counter("huetui_writes_saved") == 0
+
+    light.put_api_param(Parameter.ON, True)
+    assert bridge.metrics.counter("huetui_writes_saved") == 1
+    assert simulator.bridge.stats["requests"] == 0